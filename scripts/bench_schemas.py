@@ -0,0 +1,66 @@
+"""
+    Times "GET /children/1/comments" and "GET /children/1/attendances" against the seed data, and the cost of
+building each endpoint's schema per request compared with reusing the cached_schema() instance.
+Run from the repository root: python scripts/bench_schemas.py [--requests 1000]
+"""
+
+import argparse
+from time import perf_counter
+from seeded_app import seeded_app
+
+
+def per_call(function, repeat):
+    """Returns the mean microseconds of calling function repeat times, after a short warm-up."""
+    for _ in range(min(repeat, 50)):
+        function()
+    start = perf_counter()
+    for _ in range(repeat):
+        function()
+    return (perf_counter() - start) / repeat * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    repeat = parser.parse_args().requests
+    app, client, headers = seeded_app()
+    from init import db
+    from schemas import cached_schema
+    from models.child import Child, ChildSchema
+    from models.attendance import Attendance, AttendanceSchema
+
+    # Endpoint, schema class and the options its handler passes to cached_schema()
+    cases = [
+        (
+            "/children/1/comments",
+            ChildSchema,
+            {"only": ["user_id", "first_name", "last_name", "comments"]},
+        ),
+        ("/children/1/attendances", AttendanceSchema, {"many": True}),
+    ]
+    auth = headers("teacher")
+    print(f"{repeat} calls each, teacher token, seeded SQLite database")
+    for path, schema_class, options in cases:
+        response = client.get(path, headers=auth)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+        request_us = per_call(lambda: client.get(path, headers=auth), repeat)
+        with app.app_context():
+            if schema_class is ChildSchema:
+                data = db.session.get(Child, 1)
+            else:
+                stmt = db.select(Attendance).where(Attendance.child_id == 1)
+                data = db.session.scalars(stmt).all()
+            # Builds and dumps with a new schema as each request did before cached_schema()
+            built_us = per_call(lambda: schema_class(**options).dump(data), repeat)
+            cached_us = per_call(
+                lambda: cached_schema(schema_class, **options).dump(data), repeat
+            )
+        print(f"GET {path}")
+        print(f"  request                {request_us:8.0f} us")
+        print(f"  new schema + dump      {built_us:8.0f} us")
+        print(f"  cached schema + dump   {cached_us:8.0f} us")
+
+
+if __name__ == "__main__":
+    main()
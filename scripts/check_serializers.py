@@ -0,0 +1,117 @@
+"""
+    Checks that fast_dump() returns the same data as marshmallow for every cached schema variant, and that
+OrjsonProvider writes the same bytes as Flask's default provider. Exits with status 1 on any difference.
+Run from the repository root: python scripts/check_serializers.py
+"""
+
+import json
+import sys
+from seeded_app import seeded_app
+
+# Comments with non-ASCII text, one added and one edited, on top of the seed data
+NEW_COMMENT = {
+    "message": "Zoë a mangé une crème brûlée 🍮 «très bien»",
+    "urgency": "positive",
+}
+EDITED_COMMENT = {"message": "Nguyễn read 中文 stories — ask about it"}
+
+# Values the provider must encode exactly as Flask does, besides every dumped schema output
+PROVIDER_CASES = [
+    {"z": 1, "a": [1.5, None, True], "m": {"y": "é", "b": " "}},
+    ["plain ascii", 'tab\tand "quotes"', "emoji 🍎", "cjk 中文"],
+    {"big": 2**53 + 1, "negative": -0.0, "small": 0.001, "nested": [[{}], []]},
+]
+
+
+def get_routes(app):
+    """Returns the path of every GET endpoint with its URL ids set to 1."""
+    paths = []
+    for rule in app.url_map.iter_rules():
+        if "GET" not in rule.methods or rule.endpoint == "static":
+            continue
+        paths.append(rule.build({name: 1 for name in rule.arguments})[1])
+    return sorted(paths)
+
+
+def model_for(schema, models):
+    # The model a schema dumps shares its name, e.g. "ChildSchema" or its subclass "CommentListSchema"
+    for cls in type(schema).__mro__:
+        model = models.get(cls.__name__.removesuffix("Schema"))
+        if model is not None:
+            return model
+    return None
+
+
+def find_differences(app, client, headers):
+    """Returns (checked, failures): the number of comparisons made and a description of each difference.
+    Takes the app, test client and headers function returned by seeded_app().
+    """
+    from flask.json.provider import DefaultJSONProvider
+    from init import db
+    from schemas import _schemas
+    from serializers import fast_dump
+
+    # Adds non-ASCII text through the API
+    for response in (
+        client.post(
+            "/children/1/comments", headers=headers("parent"), json=NEW_COMMENT
+        ),
+        client.patch(
+            "/children/1/comments/1", headers=headers("parent"), json=EDITED_COMMENT
+        ),
+    ):
+        if response.status_code not in (200, 201):
+            raise RuntimeError(f"Adding non-ASCII data failed: {response.get_json()}")
+    # Every GET endpoint is requested by each role, so the handlers build their schema variants
+    for path in get_routes(app):
+        for role in ("admin", "teacher", "parent"):
+            for query in ("", "?limit=2"):
+                client.get(path + query, headers=headers(role))
+
+    failures = []
+    checked = 0
+    default = DefaultJSONProvider(app)
+    default.sort_keys = app.json.sort_keys
+    models = {
+        mapper.class_.__name__: mapper.class_ for mapper in db.Model.registry.mappers
+    }
+    with app.test_request_context():
+        outputs = list(PROVIDER_CASES)
+        for key, schema in list(_schemas.items()):
+            model = model_for(schema, models)
+            # Schemas that only load request bodies have no model to dump
+            if model is None:
+                continue
+            rows = db.session.scalars(db.select(model)).all()
+            samples = [rows] if schema.many else rows
+            for sample in samples:
+                checked += 1
+                expected = schema.dump(sample)
+                actual = fast_dump(schema, sample)
+                # Compared as text so the order of keys at every level must match too
+                if json.dumps(actual, default=str) != json.dumps(expected, default=str):
+                    failures.append(
+                        f"fast_dump differs for {key}: {actual!r} != {expected!r}"
+                    )
+                outputs.append(expected)
+        for value in outputs:
+            checked += 1
+            expected = default.response(value).get_data()
+            actual = app.json.response(value).get_data()
+            if actual != expected:
+                failures.append(
+                    f"OrjsonProvider bytes differ: {actual!r} != {expected!r}"
+                )
+    return checked, failures
+
+
+def main():
+    checked, failures = find_differences(*seeded_app())
+    for failure in failures:
+        print(failure)
+    print(f"{checked} checks, {len(failures)} differences")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
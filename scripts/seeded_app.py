@@ -0,0 +1,51 @@
+"""
+    Builds the app against a fresh SQLite database seeded by "flask cli db_init", for the scripts in this folder
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+
+# Seeded users, by role
+LOGINS = {
+    "admin": ("admin@childcare.com", "admin123"),
+    "teacher": ("jenny@childcare.com", "jenny123"),
+    "parent": ("bobby@spam.com", "bobby123"),
+}
+
+
+def seeded_app():
+    """Returns (app, client, headers), where headers(role) returns the Authorization header of a seeded user.
+    Settings are fixed so results do not depend on the caller's ".env": rate limiting and compression are
+    turned off and the database is a new temporary SQLite file.
+    """
+    directory = tempfile.mkdtemp(prefix="classtracker-")
+    os.environ["DB_URI"] = "sqlite:///" + os.path.join(directory, "app.db")
+    os.environ["RATE_LIMIT_STORE"] = os.path.join(directory, "ratelimit.sqlite3")
+    os.environ["JWT_KEY"] = "scripts-only-key"
+    os.environ["RATE_LIMIT_ENABLED"] = "False"
+    os.environ["COMPRESSION_ENABLED"] = "False"
+    sys.path.insert(0, os.path.abspath(SRC))
+    # Importing and seeding print progress messages that would bury the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import app
+
+        result = app.test_cli_runner().invoke(args=["cli", "db_init"])
+    if result.exit_code != 0:
+        raise RuntimeError(f"Seeding failed: {result.output}{result.exception}")
+    client = app.test_client()
+    tokens = {}
+    for role, (email, password) in LOGINS.items():
+        response = client.post(
+            "/users/login", json={"email": email, "password": password}
+        )
+        tokens[role] = response.get_json()["token"]
+
+    def headers(role):
+        return {"Authorization": f"Bearer {tokens[role]}"}
+
+    return app, client, headers
@@ -5,9 +5,25 @@ from blueprints.children_bp import children_bp
 from blueprints.teachers_bp import teachers_bp
 from blueprints.groups_bp import groups_bp
 from blueprints.contacts_bp import contacts_bp
+from blueprints.comments_bp import comments_bp
 
 from marshmallow.exceptions import ValidationError
 from sqlalchemy.exc import IntegrityError
+from hashing import HashingBusy
+from ratelimit import rate_limit
+from compression import compress
+from database import remember_writes
+from instrumentation import sql_stats_header, log_sql_stats
+
+# Rate limits every request before its endpoint, and therefore before @jwt_required(), runs
+app.before_request(rate_limit)
+# Compresses responses after every endpoint and error handler has produced them
+app.after_request(compress)
+# Keeps the reads of users who just wrote on the primary database while a read replica catches up
+app.after_request(remember_writes)
+# Reports the SQL each request runs in debug mode, the log includes statements run while streaming
+app.after_request(sql_stats_header)
+app.teardown_request(log_sql_stats)
 
 app.register_blueprint(cli_commands)
 app.register_blueprint(users_bp)
@@ -15,6 +31,7 @@ app.register_blueprint(children_bp)
 app.register_blueprint(teachers_bp)
 app.register_blueprint(groups_bp)
 app.register_blueprint(contacts_bp)
+app.register_blueprint(comments_bp)
 
 
 @app.route("/")
@@ -41,6 +58,14 @@ def invalid_request(err):
 @app.errorhandler(IntegrityError)
 def integrity_error(err):
     print(err.__dict__)
+    # Unique index violations, e.g. updating a group to the name and day of another group
+    if (
+        getattr(err.orig, "pgcode", None) == "23505"
+        or "UNIQUE constraint failed" in str(err.orig)
+    ):
+        return {
+            "Error": "A record with these values already exists. Please provide unique values"
+        }, 400
     if vars(err)["code"] == "gkpj":
         return {
             "Error": "One of the provided values does not exist. Please ensure both values in the request body are accurate"
@@ -60,4 +85,9 @@ def incorrect_body(err):
     }, 400
 
 
+@app.errorhandler(HashingBusy)
+def hashing_busy(err):
+    return {"Error": "The server is busy. Please try again shortly"}, 503
+
+
 print(app.url_map)
@@ -1,20 +1,188 @@
-from init import db
-from models.user import User, UserSchema
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from time import monotonic
+from flask import abort
+from flask_jwt_extended import get_jwt, get_jti
+from flask_jwt_extended import create_access_token, create_refresh_token
+from init import app, db, jwt
+from database import on_primary
+from models.user import User
+from models.refresh_token import RefreshToken
 
 
+# Returned by RoleCache.get when no fresh entry exists, as None is a valid cached value
+MISSING = object()
+
+
+class RoleCache:
+    """Bounded least-recently-used cache of user roles keyed by user id.
+    Entries expire "ttl" seconds after they are written.
+    Values are dicts of "is_admin", "is_teacher" and "role_version", or None for users that do not exist.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or monotonic() - entry[1] >= self.ttl:
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, user_id, roles):
+        with self._lock:
+            self._entries[user_id] = (roles, monotonic())
+            self._entries.move_to_end(user_id)
+            # Evicts the least recently used entries once the cache is full
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+# Each worker process holds its own cache, so other workers see a role change once their entry expires
+role_cache = RoleCache(app.config["ROLE_CACHE_SIZE"], app.config["ROLE_CACHE_TTL"])
+
+
+def role_claims(user):
+    """Returns the role claims signed into a user's JWT when they log in."""
+    return {
+        "is_admin": bool(user.is_admin),
+        "is_teacher": bool(user.is_teacher),
+        "role_version": user.role_version,
+    }
+
+
+def user_roles(user_id):
+    """Returns the user's roles from the cache, or None if the user does not exist.
+    On a miss only the role columns are selected, so no User object or relationships are loaded.
+    Roles are always read from the primary database, a lagging replica could return revoked ones.
+    """
+    roles = role_cache.get(user_id)
+    if roles is MISSING:
+        stmt = db.select(User.is_admin, User.is_teacher, User.role_version).where(
+            User.id == user_id
+        )
+        with on_primary(db.session):
+            row = db.session.execute(stmt).first()
+        roles = role_claims(row) if row else None
+        role_cache.set(user_id, roles)
+    return roles
+
+
+def current_role_version(user_id):
+    """Returns the user's current "role_version", or None if the user no longer exists."""
+    roles = user_roles(user_id)
+    return roles["role_version"] if roles else None
+
+
+def bump_role_version(user):
+    """Increments a user's "role_version" so tokens carrying their old roles stop being accepted.
+    Must be called before the change is committed.
+    """
+    user.role_version = (user.role_version or 0) + 1
+
+
+def cache_user_roles(user):
+    """Writes a user's committed roles through to the cache."""
+    role_cache.set(user.id, role_claims(user))
+
+
+def cache_deleted_user(user_id):
+    """Records a deleted user so their existing tokens are rejected without a database lookup."""
+    role_cache.set(user_id, None)
+
+
+def create_tokens(user_id, claims):
+    """Returns a new access token carrying the role claims and a new refresh token.
+    The refresh token is staged in the "refresh_tokens" table; the caller commits the session.
+    """
+    access_token = create_access_token(
+        identity=user_id, additional_claims=claims, expires_delta=timedelta(hours=2)
+    )
+    lifetime = timedelta(days=app.config["REFRESH_TOKEN_DAYS"])
+    refresh_token = create_refresh_token(identity=user_id, expires_delta=lifetime)
+    db.session.add(
+        RefreshToken(
+            jti=get_jti(refresh_token),
+            user_id=user_id,
+            expires=datetime.now() + lifetime,
+            revoked=False,
+        )
+    )
+    return access_token, refresh_token
+
+
+def revoke_refresh_tokens(user_id):
+    """Stages revoking every unrevoked refresh token of a user; the caller commits the session."""
+    stmt = (
+        db.update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked == False)
+        .values(revoked=True)
+    )
+    db.session.execute(stmt)
+
+
+# Called by @jwt_required() for every request
+# Tokens whose signed "role_version" no longer matches the user's are rejected
+@jwt.token_in_blocklist_loader
+def outdated_roles(jwt_header, jwt_payload):
+    # Tokens issued before role claims were added fall back to the database checks below
+    if "role_version" not in jwt_payload:
+        return False
+    return jwt_payload["role_version"] != current_role_version(jwt_payload["sub"])
+
+
+@jwt.revoked_token_loader
+def revoked_token(jwt_header, jwt_payload):
+    return {"Error": "Your account permissions have changed. Please log in again"}, 401
+
+
+def _signed_claims(user_id):
+    # Returns the role claims of the request's JWT if they belong to user_id
+    claims = get_jwt()
+    if claims.get("sub") == user_id and "role_version" in claims:
+        return claims
+    return None
+
 
 def admin_check(user_id):
-    stmt = db.select(User).where(User.id == user_id, User.is_admin)
-    user = db.session.scalar(stmt)
-    if user:
+    roles = _signed_claims(user_id) or user_roles(user_id)
+    if roles and roles["is_admin"]:
         return True
     else:
-        return False 
-        
+        return False
+
 
 def user_status(user_id):
-    user = db.get_or_404(User, user_id)
-    user = UserSchema(exclude=["password"]).dump(user)
+    user = _signed_claims(user_id) or user_roles(user_id)
+    # Matches the 404 previously raised when the user's tuple could not be found
+    if user is None:
+        abort(404)
     if user["is_admin"] == True:
         return "Admin"
     elif user["is_teacher"] == True:
@@ -9,9 +9,21 @@ from models.child import Child, ChildSchema
 from models.comment import Comment, CommentSchema
 from models.contact import Contact
 from models.attendance import Attendance, AttendanceSchema
+from models.attendance_event import AttendanceEvent
+from models.group import Group
 from models.user import User
 from init import db
 from auth import user_status
+from eager_loading import eager_load, load_columns
+from schemas import cached_schema
+from fieldsets import sparse_schema
+from serializers import fast_dump
+from conditional import conditional
+from instrumentation import query_budget
+from inserts import insert_new, insert_many
+from bulk import bulk_items, load_items, existing_ids, bulk_response
+from pagination import collection_response, page_args, keyset, split_page, page_headers
+from summaries import refresh_enrolment
 
 # Initialises flask Blueprint class "children_bp"
 # Defines url prefix for endpoints defined in with @children_bp wrapper
@@ -21,8 +33,12 @@ children_bp = Blueprint("child", __name__, url_prefix="/children")
 # GET Children
 # wrapper links function "get_children" to endpoint "/children" when request is made with GET method
 @children_bp.route("/", methods=["GET"])
+# Most SQL statements a request should run, debug mode logs requests exceeding it
+@query_budget(5)
 # Mandates a JWT for requests to this endpoint
 @jwt_required()
+# Answers requests with an unchanged ETag or Last-Modified date with 304 Not Modified
+@conditional(Child, ChildSchema)
 def get_children():
     """Returns multiple child tuples based on user permissions.
     Endpoint for "GET" "/children"
@@ -35,19 +51,29 @@ def get_children():
     # A database query selecting all "child" instances is submitted
     # Returned SQLAlchemy objects are converted to dictionaries via marshmallow
     # Thenreturned to the user
+    # Relationships dumped by the schema are loaded alongside the children rather than per child
+    # Children are streamed to the user in batches rather than loaded all at once
+    # Requests with "?limit=" or "?after=" receive one page ordered by id and the next page's cursor
+    # "?fields=" limits the dumped fields, and the selected columns and loaded relationships with them
     if user_type == "Admin":
-        stmt = db.select(Child)
-        children = db.session.scalars(stmt).all()
-        return ChildSchema(many=True).dump(children)
+        schema = sparse_schema(ChildSchema, many=True)
+        stmt = db.select(Child).options(
+            *eager_load(Child, schema), *load_columns(Child, schema)
+        )
+        return collection_response(stmt, schema, Child.id)
 
     # If user is a "Parent"
     # A database query selecting all "child" instances with a matching "user_id" is submitted
     # Returned SQLAlchemy objects are converted to dictionaries via marshmallow
     # Then returned to the user
     if user_type == "Parent":
-        stmt = db.select(Child).where(Child.user_id == user_id)
-        registered_children = db.session.scalars(stmt).all()
-        return ChildSchema(many=True).dump(registered_children)
+        schema = sparse_schema(ChildSchema, many=True)
+        stmt = (
+            db.select(Child)
+            .where(Child.user_id == user_id)
+            .options(*eager_load(Child, schema), *load_columns(Child, schema))
+        )
+        return collection_response(stmt, schema, Child.id)
 
     # If the user is not an "Admin" or "Parent" an error message is returned
     else:
@@ -56,7 +82,9 @@ def get_children():
 
 # GET Child
 @children_bp.route("/<int:id>", methods=["GET"])
+@query_budget(5)
 @jwt_required()
+@conditional(Child, ChildSchema)
 def get_child(id):
     """Returns single child instance provided user has appropriate permissions.
     Endpoint for "GET" "/children/<int>".
@@ -65,10 +93,13 @@ def get_child(id):
     # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
     user_type = user_status(user_id)
     # The database is queried for a "child" instance with an "id" value matching the id value submitted in the URI
+    # Relationships dumped by the schema are loaded in the same round of queries
     # If no matches are found, a 404 error is raised
-    child = db.get_or_404(Child, id)
+    schema = cached_schema(ChildSchema)
+    stmt = db.select(Child).where(Child.id == id).options(*eager_load(Child, schema))
+    child = db.first_or_404(stmt)
     # A returned SQLAlchemy object is converted to a dictionary via marshmallow
-    child_dict = ChildSchema().dump(child)
+    child_dict = fast_dump(schema, child)
 
     # If the user is an "Admin", the dictionary is returned
     # If the user is not an "Admin", the child's "user_id" value must equal the id passed in the JWT
@@ -94,15 +125,15 @@ def register_child():
     if user_type != "Admin" and user_type != "Parent":
         return {"Error": "You are not authorised to access this resource"}, 403
     # Creates a dictionary using the provided request body and a marshmallow schema that mirrors the database's "child" table
-    child_info = ChildSchema(only=["first_name", "last_name"], unknown="exclude").load(
-        request.json
-    )
-    # Creates a SQLAlchemy object using the values in the marshmallow-formatted dictionary
+    child_info = cached_schema(
+        ChildSchema, only=["first_name", "last_name"], unknown="exclude"
+    ).load(request.json)
+    # Creates a dictionary of the new child's column values using the marshmallow-formatted dictionary
     # The provided values are capitalised to sanitise them
-    new_child = Child(
-        first_name=child_info["first_name"].capitalize(),
-        last_name=child_info["last_name"].capitalize(),
-    )
+    new_child = {
+        "first_name": child_info["first_name"].capitalize(),
+        "last_name": child_info["last_name"].capitalize(),
+    }
     # "Admin" users must provide the "user_id" value for the child instance in the request body
     # If the user is an "Admin", a database query checks if the provided "user_id" exists
     # If no such user exists, an error is raised
@@ -113,30 +144,88 @@ def register_child():
             return {
                 "Error": "No such user. Please check 'user_id' matches a registered user"
             }, 400
-        new_child.user_id = request.json["user_id"]
-    # If the user is a "Parent", the SQLAlchemy object's "user_id" value is automatically assigned the JWT id
+        new_child["user_id"] = request.json["user_id"]
+    # If the user is a "Parent", the child's "user_id" value is automatically assigned the JWT id
     elif user_type == "Parent":
-        new_child.user_id = user_id
-    # A database query checks if a child is already registered with the provided "first_name", "last_name" and "user_id" values
+        new_child["user_id"] = user_id
+    # The child is inserted unless one is already registered with the same "first_name", "last_name" and "user_id" values
     # An error is returned if the child already exists
-    stmt = db.select(Child).where(
-        Child.first_name == new_child.first_name,
-        Child.last_name == new_child.last_name,
-        Child.user_id == new_child.user_id,
-    )
-    child = db.session.scalar(stmt)
-    if child:
+    child = insert_new(Child, ["user_id", "first_name", "last_name"], **new_child)
+    if child is None:
         return {"Error": "This child is already registered to this user"}, 400
-    # The SQLAlchemy child object is submitted to the connected database
-    db.session.add(new_child)
+    # The inserted row is converted to a dictionary before committing, so it is not reloaded
+    child_dict = cached_schema(
+        ChildSchema, only=["first_name", "last_name", "user_id"]
+    ).dump(child)
     # The submitted values are commited to the database
     db.session.commit()
     # The submitted instance data is returned as a dictionary
-    return {
-        "Success": ChildSchema(only=["first_name", "last_name", "user_id"]).dump(
-            new_child
-        )
-    }, 201
+    return {"Success": child_dict}, 201
+
+
+# POST Children in bulk
+@children_bp.route("/bulk", methods=["POST"])
+@jwt_required()
+def register_children():
+    """Registers a list of children in one transaction. Each item is validated like a "POST" "/children" body
+    and invalid items are reported by their index without stopping the others.
+    Endpoint for "POST" "/children/bulk".
+    """
+    user_id = get_jwt_identity()
+    # The user's permissions are checked once for every child in the request
+    user_type = user_status(user_id)
+    if user_type != "Admin" and user_type != "Parent":
+        return {"Error": "You are not authorised to access this resource"}, 403
+    items = bulk_items()
+    # "Admin" users must provide a "user_id" value for every child
+    required = ["first_name", "last_name"]
+    if user_type == "Admin":
+        required.append("user_id")
+    child_info, errors = load_items(
+        cached_schema(ChildSchema, only=["first_name", "last_name"], unknown="exclude"),
+        items,
+        required,
+    )
+    # A single query checks which submitted "user_id" values belong to registered users
+    if user_type == "Admin":
+        user_ids = existing_ids(User.id, [items[index]["user_id"] for index in child_info])
+    # Builds each child's column values, sanitised like a single child's
+    # A child submitted twice in the request is reported on its later item
+    rows, keys = [], {}
+    for index, info in child_info.items():
+        row = {
+            "first_name": info["first_name"].capitalize(),
+            "last_name": info["last_name"].capitalize(),
+            "user_id": items[index]["user_id"] if user_type == "Admin" else user_id,
+        }
+        if user_type == "Admin" and not (
+            type(row["user_id"]) is int and row["user_id"] in user_ids
+        ):
+            errors[index] = "No such user. Please check 'user_id' matches a registered user"
+            continue
+        key = (row["user_id"], row["first_name"], row["last_name"])
+        if key in keys:
+            errors[index] = f"This child is the same as item {keys[key]}"
+            continue
+        keys[key] = index
+        rows.append(row)
+    # The children are inserted in batches, skipping any already registered to their user
+    inserted = insert_many(
+        Child,
+        rows,
+        [Child.id, Child.user_id, Child.first_name, Child.last_name],
+        ["user_id", "first_name", "last_name"],
+    )
+    schema = cached_schema(ChildSchema, only=["id", "first_name", "last_name", "user_id"])
+    created = {}
+    for child in inserted:
+        index = keys.pop((child.user_id, child.first_name, child.last_name))
+        created[index] = {"index": index, **schema.dump(child)}
+    for index in keys.values():
+        errors[index] = "This child is already registered to this user"
+    # Every child is commited in one transaction
+    db.session.commit()
+    return bulk_response([created[index] for index in sorted(created)], errors)
 
 
 # PATCH Child
@@ -149,7 +238,7 @@ def update_child(id):
     user_id = get_jwt_identity()
     # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
     user_type = user_status(user_id)
-    
+
     # The database is queried for a "child" instance with an "id" matching the one submitted in the URI
     # If no matches are found, a 404 error is raised
     child = db.get_or_404(Child, id)
@@ -163,7 +252,8 @@ def update_child(id):
             request.json["last_name"] = request.json["last_name"].capitalize()
         # Screens request body values via marshmallow schema and raises an error for invalid inputs
         # Records values that will be updated into "new_info" var as a dict
-        new_info = ChildSchema(
+        new_info = cached_schema(
+            ChildSchema,
             only=["first_name", "last_name"],
             unknown="exclude",
         ).load(request.json)
@@ -200,7 +290,17 @@ def delete_child(id):
     # If the user is not an "Admin", the child instance's "user_id" value is compared to the id provided in the JWT
     # If the user is authorised, the instance is deleted from the database
     if user_type == "Admin" or child.user_id == user_id:
+        # Children who have signed in are kept, so the groups' attendance history and summaries stay complete
+        stmt = db.select(AttendanceEvent.event_id).where(AttendanceEvent.child_id == id)
+        if db.session.scalar(stmt.limit(1)) is not None:
+            return {
+                "Error": "This child has attendance history and cannot be deleted"
+            }, 400
+        # Deleting the child also deletes their attendances, so today's summaries of their groups are recounted
+        group_ids = [attendance.group_id for attendance in child.attendances]
         db.session.delete(child)
+        db.session.flush()
+        refresh_enrolment(group_ids)
         # The deletion is committed to the database
         db.session.commit()
         return {"Success": "Child registration deleted"}, 200
@@ -211,20 +311,51 @@ def delete_child(id):
 
 # GET Comments about child
 @children_bp.route("/<int:id>/comments", methods=["GET"])
+@query_budget(4)
 @jwt_required()
+@conditional(
+    Child, ChildSchema, only=["user_id", "first_name", "last_name", "comments"]
+)
 def get_child_comments(id):
     """Returns child data and comments linked to them via foreign key. Endpoint for "GET" "/children/<int>/comments"."""
     user_id = get_jwt_identity()
     # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
     user_type = user_status(user_id)
+    limit, after = page_args()
+    cursor = None
+    if limit is None:
+        schema = cached_schema(
+            ChildSchema, only=["user_id", "first_name", "last_name", "comments"]
+        )
+    else:
+        schema = cached_schema(ChildSchema, only=["user_id", "first_name", "last_name"])
     # The database is queried for a "child" instance with an "id" value matching the submitted URI value
+    # The child's comments and their authors are loaded in the same round of queries
     # If no matches are found, a 404 error is raised
-    child = db.get_or_404(Child, id)
+    stmt = db.select(Child).where(Child.id == id).options(*eager_load(Child, schema))
+    child = db.first_or_404(stmt)
     # Converts the retrieved child SQLAlchemy object to a dict via marshmallow schema
     # Only intakes values in the schema
-    child_dict = ChildSchema(
-        only=["user_id", "first_name", "last_name", "comments"]
-    ).dump(child)
+    child_dict = fast_dump(schema, child)
+    # Paged requests query one page of the child's comments ordered by "comment_id"
+    # The comments are dumped with the same fields as the schema's nested "comments" list
+    if limit is not None:
+        comment_schema = cached_schema(
+            CommentSchema,
+            exclude=["child", "comment_edited", "date_edited"],
+            many=True,
+        )
+        comment_stmt = keyset(
+            db.select(Comment)
+            .where(Comment.child_id == id)
+            .options(*eager_load(Comment, comment_schema)),
+            Comment.comment_id,
+            limit,
+            after,
+        )
+        comments = db.session.scalars(comment_stmt).all()
+        comments, cursor = split_page(comments, limit, Comment.comment_id)
+        child_dict["comments"] = fast_dump(comment_schema, comments)
     # Checks if the user is authorised to retrieve the data
     # If the user is an "Admin" or "Teacher" or the child's "user_id" value matches the JWT id value, the dict is returned
     if (
@@ -232,7 +363,7 @@ def get_child_comments(id):
         or user_type == "Teacher"
         or child_dict["user_id"] == user_id
     ):
-        return child_dict
+        return child_dict, 200, page_headers(cursor)
     # If the user is not authorised, an error message is returned
     else:
         return {"Error": "You are not authorised to access this resource"}, 403
@@ -240,29 +371,38 @@ def get_child_comments(id):
 
 # GET Comment single about child
 @children_bp.route("/<int:id>/comments/<int:id2>", methods=["GET"])
+@query_budget(3)
 @jwt_required()
+@conditional(Comment, CommentSchema)
 def get_comment(id, id2):
     """Returns single comment. Endpoint for "GET" "/children/<int>/comments/<int>"."""
     user_id = get_jwt_identity()
     # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
     user_type = user_status(user_id)
+    schema = cached_schema(
+        CommentSchema,
+        only=[
+            "child",
+            "user",
+            "comment_edited",
+            "date_edited",
+            "date_created",
+            "urgency",
+            "message",
+        ],
+    )
     # The database is queried for a "comment" with a "child_id" value matching id and a "comment_id" value matching id2
-    stmt = db.select(Comment).where(Comment.child_id == id, Comment.comment_id == id2)
+    # The comment's child and author are joined onto the same query
+    stmt = (
+        db.select(Comment)
+        .where(Comment.child_id == id, Comment.comment_id == id2)
+        .options(*eager_load(Comment, schema))
+    )
     comment = db.session.scalar(stmt)
     # Checks if a comment matching the URI-input id values is in the database or returns a 404 error
     if comment:
         # Converts the retrieved comment SQLAlchemy object to a dict via marshmallow schema
-        comment_dict = CommentSchema(
-            only=[
-                "child",
-                "user",
-                "comment_edited",
-                "date_edited",
-                "date_created",
-                "urgency",
-                "message",
-            ]
-        ).dump(comment)
+        comment_dict = fast_dump(schema, comment)
         # Checks if the user is authorised to retrieve the data
         # If the user is an "Admin" or "Teacher" or the child's "user_id" value matches the JWT id value, the dict is returned
         if (
@@ -295,9 +435,9 @@ def post_comment(id):
         if child.user_id != user_id:
             return {"Error": "You are not authorised to access this resource"}, 403
     # Screens any provided comment values via the marshmallow schema
-    comment_info = CommentSchema(only=["message", "urgency"], unknown="exclude").load(
-        request.json
-    )
+    comment_info = cached_schema(
+        CommentSchema, only=["message", "urgency"], unknown="exclude"
+    ).load(request.json)
     # Creates SQLAlchemy object in new_comment var
     new_comment = Comment(
         message=comment_info["message"],
@@ -311,9 +451,9 @@ def post_comment(id):
     db.session.commit()
     # Returns new comment data excluding "comment_edited" and "date_edited" values
     return {
-        "Success": CommentSchema(exclude=["comment_edited", "date_edited"]).dump(
-            new_comment
-        )
+        "Success": cached_schema(
+            CommentSchema, exclude=["comment_edited", "date_edited"]
+        ).dump(new_comment)
     }, 201
 
 
@@ -333,7 +473,8 @@ def update_comment(id, id2):
         if "urgency" in request.json:
             request.json["urgency"] = request.json["urgency"].lower()
         # Screens any provided attribute values via the marshmallow schema
-        new_info = CommentSchema(
+        new_info = cached_schema(
+            CommentSchema,
             only=["message", "urgency"],
             unknown="exclude",
         ).load(request.json)
@@ -354,7 +495,7 @@ def update_comment(id, id2):
             comment.date_edited = datetime.now().date()
             # The updated comment is submitted to the connected database
             db.session.commit()
-            return CommentSchema().dump(comment), 200
+            return cached_schema(CommentSchema).dump(comment), 200
         # If the comment's "user_id" value does not match the id value in the JWT token an error is returned
         else:
             return {"Error": "You are not authorised to access this resource"}, 403
@@ -394,19 +535,35 @@ def delete_comment(id, id2):
 # Attendances
 # GET child's attendances
 @children_bp.route("/<int:id>/attendances", methods=["GET"])
+@query_budget(3)
 @jwt_required()
+@conditional(Attendance, AttendanceSchema)
 def get_child_attendances(id):
     """Returns attendance instances with "child_id" matching URI input id value. Endpoint for "GET" "/children/<int>/attendances"."""
     user_id = get_jwt_identity()
     # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
     user_type = user_status(user_id)
+    schema = cached_schema(AttendanceSchema, many=True)
+    limit, after = page_args()
+    cursor = None
     # Queries database for attendances where the child_id is equal to the URI input id value
-    stmt = db.select(Attendance).where(Attendance.child_id == id)
-    attendances = db.session.scalars(stmt).all()
+    # Each attendance's child, group and contact are loaded alongside it
+    stmt = (
+        db.select(Attendance)
+        .where(Attendance.child_id == id)
+        .options(*eager_load(Attendance, schema))
+    )
+    # Paged requests select one page ordered by "attendance_id"
+    if limit is None:
+        attendances = db.session.scalars(stmt).all()
+    else:
+        stmt = keyset(stmt, Attendance.attendance_id, limit, after)
+        attendances = db.session.scalars(stmt).all()
+        attendances, cursor = split_page(attendances, limit, Attendance.attendance_id)
     # Checks if any attendances were returned and returns error if not
     if attendances:
         # Converts returned SQLAlchemy objects to a dict
-        attendances_dict = AttendanceSchema(many=True).dump(attendances)
+        attendances_dict = fast_dump(schema, attendances)
         # Checks if the user is authorised to access the dictionary data based on user type
         if (
             user_type == "Admin"
@@ -415,7 +572,7 @@ def get_child_attendances(id):
             or attendances_dict[0]["child"]["user_id"] == user_id
         ):
             # Returns a dictionary containing all attendances
-            return attendances_dict
+            return attendances_dict, 200, page_headers(cursor)
         else:
             # Returns an error if the user is not authorised
             return {"Error": "You are not authorised to access this resource"}, 403
@@ -426,21 +583,27 @@ def get_child_attendances(id):
 
 # GET child's single attendance
 @children_bp.route("/<int:id>/attendances/<int:id2>", methods=["GET"])
+@query_budget(3)
 @jwt_required()
+@conditional(Attendance, AttendanceSchema)
 def get_attendance(id, id2):
     """Returns single attendance as a dictionary. Endpoint for "GET" "/children/<int>/attendances/<int>"."""
     user_id = get_jwt_identity()
     # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
     user_type = user_status(user_id)
+    schema = cached_schema(AttendanceSchema)
     # The database is queried for an "attendance" with a "child_id" value matching id and an attendance "id" value matching id2
-    stmt = db.select(Attendance).where(
-        Attendance.child_id == id, Attendance.attendance_id == id2
+    # The attendance's child, group and contact are joined onto the same query
+    stmt = (
+        db.select(Attendance)
+        .where(Attendance.child_id == id, Attendance.attendance_id == id2)
+        .options(*eager_load(Attendance, schema))
     )
     attendance = db.session.scalar(stmt)
     # Confirms an attendance was retrieved or returns a 404 error
     if attendance:
         # Converts returned SQLAlchemy object to a dict
-        attendance_dict = AttendanceSchema().dump(attendance)
+        attendance_dict = fast_dump(schema, attendance)
         # Checks if the user is an "Admin", "Teacher" or the attendance's child user_id value equals the request user's
         if (
             user_type == "Admin"
@@ -476,24 +639,33 @@ def post_attendance(id):
     # If the user is a teacher, they are not permitted to generate attendances
     elif user_type == "Teacher":
         return {"Error": "You are not authorised to access this resource"}, 403
-    # Check for same child attending same group in DB
-    # If the child is already registered, an error is raised
-    stmt = db.select(Attendance).where(
-        Attendance.child_id == id, Attendance.group_id == request.json["group_id"]
-    )
-    attendance_exists = db.session.scalar(stmt)
-    if attendance_exists:
-        return {"Error": "Child attendance is already registered for that group"}, 400
-    # Creates Attendance SQLAlchemy object prepared for submission
-    new_attendance = Attendance(
+    # Inserts the attendance unless the child is already registered for the same group
+    # If the child is already registered, an error is returned
+    new_attendance = insert_new(
+        Attendance,
+        ["child_id", "group_id"],
         group_id=request.json["group_id"],
         contact_id=request.json["contact_id"],
         child_id=id,
     )
-    # Submits attendance instance to the database
-    db.session.add(new_attendance)
+    if new_attendance is None:
+        return {"Error": "Child attendance is already registered for that group"}, 400
+    # Today's attendance summary of the group counts the new enrolment
+    refresh_enrolment([new_attendance.group_id])
+    # The child, group and contact are loaded by one query and kept referenced, so dumping the row built
+    # from RETURNING finds them in the session instead of lazy loading each with its own SELECT
+    related = db.session.execute(
+        db.select(Child, Group, Contact)
+        .select_from(Attendance)
+        .join(Attendance.child)
+        .join(Attendance.group)
+        .join(Attendance.contact)
+        .where(Attendance.attendance_id == new_attendance.attendance_id)
+    ).one()
+    # The inserted row is converted to a dictionary before committing, so it is not reloaded
+    attendance_dict = cached_schema(AttendanceSchema).dump(new_attendance)
     db.session.commit()
-    return {"Success": AttendanceSchema().dump(new_attendance)}, 201
+    return {"Success": attendance_dict}, 201
 
 
 # PATCH child's attendance
@@ -516,20 +688,25 @@ def update_attendance(id, id2):
     # Confirms an attendance was retrieved or returns a 404 error
     if attendance:
         # Converts returned SQLAlchemy object to a dict
-        attendance_dict = AttendanceSchema().dump(attendance)
+        attendance_dict = cached_schema(AttendanceSchema).dump(attendance)
         # Checks if the attendance's child is registered to the user or the user is an admin or returns an error
         if attendance_dict["child"]["user_id"] == user_id or user_type == "Admin":
             # Sets the retrieved attendance's "group_id" value to the one provided in the request
             # If no new value is provided, it remains as it was
+            old_group_id = attendance.group_id
             attendance.group_id = request.json.get("group_id", attendance.group_id)
             # Sets the retrieved attendance's "contact_id" value to the one provided in the request
             # If no new value is provided, it remains as it was
             attendance.contact_id = request.json.get(
                 "contact_id", attendance.contact_id
             )
+            # Today's attendance summaries of the old and new groups are recounted if the child moved
+            if attendance.group_id != old_group_id:
+                db.session.flush()
+                refresh_enrolment([old_group_id, attendance.group_id])
             # Submits changes to the database and returns the complete attendance dict as submitted
             db.session.commit()
-            return {"Success": AttendanceSchema().dump(attendance)}, 200
+            return {"Success": cached_schema(AttendanceSchema).dump(attendance)}, 200
         # Error message is returned if the user is not authorised to update the attendance
         else:
             return {"Error": "You are not authorised to access this resource"}, 403
@@ -554,11 +731,13 @@ def delete_attendance(id, id2):
     # Confirms an attendance was retrieved or returns a 404 error
     if attendance:
         # Converts returned SQLAlchemy object to a dict to query user_id associated
-        attendance_dict = AttendanceSchema().dump(attendance)
+        attendance_dict = cached_schema(AttendanceSchema).dump(attendance)
         # Checks if the attendance's child is registered to the user or the user is an admin or returns an error
         if attendance_dict["child"]["user_id"] == user_id or user_type == "Admin":
-            # Deletes attendance and commits change to the database
+            # Deletes attendance, recounts today's attendance summary of its group and commits change to the database
             db.session.delete(attendance)
+            db.session.flush()
+            refresh_enrolment([attendance.group_id])
             db.session.commit()
             # Returns successful deletion message
             return {"Success": "Attendance deleted"}, 200
@@ -2,6 +2,7 @@
     Contains blueprint formatting and endpoints for Flask CLI commands
 """
 
+import sys
 from datetime import datetime
 from flask import Blueprint
 from init import db, bcrypt
@@ -12,20 +13,34 @@ from models.teacher import Teacher
 from models.contact import Contact
 from models.group import Group
 from models.attendance import Attendance
+from models.refresh_token import RefreshToken
+from migrations import migrate
+from summaries import refresh_enrolment, recompute, stored, differences, rebuild
 
 # Initialises flask Blueprint class "cli"
 cli_commands = Blueprint("cli", __name__)
 
 
+# Used to create or update the connected database's tables
+@cli_commands.cli.command("db_migrate")
+def db_migrate():
+    """Applies every migration in "src/migrations" not yet applied to the connected database"""
+    applied = migrate(db.engine)
+    for version, name in applied:
+        print(f"Applied migration {version}: {name}")
+    print(f"Database is up to date, {len(applied)} migrations applied")
+
+
 # Used to generate initial seeding data
 @cli_commands.cli.command("db_init")
 def db_create():
-    """Drops all tables in the connected database, recreates them and seeds them with generic data"""
-    # Drops all tables
-    db.drop_all()
-    # Generates all tables
-    db.create_all()
-    print("Dropped then created tables!")
+    """Brings the connected database's tables up to date and seeds them with generic data"""
+    # Applies any pending migrations rather than dropping and recreating tables
+    db_migrate.callback()
+    # Seeding data would duplicate records in a database that is already in use
+    if db.session.scalar(db.select(User).limit(1)):
+        print("Database already contains users, skipped seeding")
+        return
     # Seeds generic user values for testing
     users = [
         User(
@@ -163,10 +178,50 @@ def db_create():
         Attendance(child_id=2, group_id=5, contact_id=2),
         Attendance(child_id=1, group_id=6, contact_id=1),
         Attendance(child_id=2, group_id=3, contact_id=3),
-        Attendance(child_id=2, group_id=3, contact_id=4),
+        Attendance(child_id=4, group_id=3, contact_id=4),
     ]
-    # Stages generic attendances
+    # Stages generic attendances and counts them in today's attendance summaries
     db.session.add_all(attendances)
+    db.session.flush()
+    refresh_enrolment([attendance.group_id for attendance in attendances])
     # Commits generic attendances to the database
     db.session.commit()
     print("Attendances seeded, well done!")
+
+
+# Used to clear refresh tokens that can no longer be used
+@cli_commands.cli.command("prune_tokens")
+def prune_tokens():
+    """Deletes revoked and expired refresh tokens from the connected database"""
+    stmt = db.delete(RefreshToken).where(
+        db.or_(RefreshToken.revoked == True, RefreshToken.expires < datetime.now())
+    )
+    result = db.session.execute(stmt)
+    db.session.commit()
+    print(f"Pruned {result.rowcount} refresh tokens")
+
+
+# Used to check the attendance summaries against attendances and attendance events
+@cli_commands.cli.command("verify_summaries")
+def verify_summaries():
+    """Recomputes the attendance summaries and lists stored rows that differ, exiting with status 1 if any do.
+    Past days' "enrolled" counts are read from the stored rows, so they are not checked.
+    """
+    lines = differences(recompute(), stored())
+    for line in lines:
+        print(line)
+    # Attendances have no dates, so only today's enrolment can be counted again
+    print("Past days' \"enrolled\" counts cannot be recomputed and were not checked")
+    if lines:
+        print(f"{len(lines)} attendance summaries differ, run \"flask cli rebuild_summaries\" to repair them")
+        sys.exit(1)
+    print("Attendance summaries match attendances and events")
+
+
+# Used to repair the attendance summaries, e.g. after a failed verify_summaries
+@cli_commands.cli.command("rebuild_summaries")
+def rebuild_summaries():
+    """Replaces every attendance summary with one recomputed from attendances and attendance events"""
+    count = rebuild()
+    db.session.commit()
+    print(f"Rebuilt {count} attendance summaries")
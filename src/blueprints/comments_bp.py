@@ -0,0 +1,112 @@
+"""
+    Contains blueprint formatting, functions and endpoints for finding "Comment" entities across children
+"""
+
+from flask import Blueprint, request
+from marshmallow.exceptions import ValidationError
+from sqlalchemy import tuple_
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models.comment import (
+    Comment,
+    CommentListSchema,
+    CommentSearchSchema,
+    CommentFeedSchema,
+)
+from models.child import Child
+from init import db
+from auth import user_status
+from eager_loading import eager_load
+from schemas import cached_schema
+from serializers import fast_dump
+from instrumentation import query_budget
+from pagination import (
+    result_limit,
+    encode_date_cursor,
+    decode_date_cursor,
+    page_headers,
+)
+from search import search_terms, comment_matches
+
+# Initialises flask Blueprint class "comments_bp" and defines url prefix for endpoints defined in with @comments_bp wrapper
+comments_bp = Blueprint("comment", __name__, url_prefix="/comments")
+
+
+# GET Comments feed
+@comments_bp.route("/", methods=["GET"])
+@query_budget(3)
+@jwt_required()
+def get_comments():
+    """Returns comments about every child in "date_created" then "comment_id" order, oldest first.
+    "?since=" continues after the last comment a client received, "?urgency=" only returns comments with that urgency.
+    The "X-Next-Cursor" header holds the "since" value of the next request, also sent when no newer comments exist.
+    Endpoint for "GET" "/comments".
+    """
+    user_id = get_jwt_identity()
+    # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
+    user_type = user_status(user_id)
+    # The feed spans every child, so it is only available to staff
+    if user_type != "Admin" and user_type != "Teacher":
+        return {"Error": "You are not authorised to access this resource"}, 403
+    # Screens the query string via the marshmallow schema, invalid values are returned as a 400 error
+    args = cached_schema(CommentFeedSchema, unknown="exclude").load(request.args)
+    limit = result_limit(args.get("limit"))
+    schema = cached_schema(CommentListSchema, many=True)
+    stmt = db.select(Comment).options(*eager_load(Comment, schema))
+    if "since" in args:
+        try:
+            since = decode_date_cursor(args["since"])
+        except ValueError:
+            raise ValidationError({"since": ["Not a valid cursor"]})
+        # Compared as a pair, so the composite index starts reading just after the cursor
+        stmt = stmt.where(tuple_(Comment.date_created, Comment.comment_id) > since)
+    if "urgency" in args:
+        stmt = stmt.where(Comment.urgency == args["urgency"])
+    stmt = stmt.order_by(Comment.date_created, Comment.comment_id).limit(limit)
+    comments = db.session.scalars(stmt).all()
+    # Clients poll with the cursor of the last comment they received, or the same cursor when there were none
+    if comments:
+        cursor = encode_date_cursor(comments[-1].date_created, comments[-1].comment_id)
+    else:
+        cursor = args.get("since")
+    return fast_dump(schema, comments), 200, page_headers(cursor, "since")
+
+
+# SEARCH Comments
+@comments_bp.route("/search", methods=["GET"])
+@query_budget(3)
+@jwt_required()
+def search_comments():
+    """Returns the comments whose message contains every word of "?q=", best matches first.
+    "?urgency=", "?from=" and "?to=" narrow the results by urgency and creation date, "?limit=" caps their number.
+    Parents only find comments about their own children.
+    Endpoint for "GET" "/comments/search".
+    """
+    user_id = get_jwt_identity()
+    # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
+    user_type = user_status(user_id)
+    # Screens the query string via the marshmallow schema, invalid values are returned as a 400 error
+    args = cached_schema(CommentSearchSchema, unknown="exclude").load(request.args)
+    words = search_terms(args["q"])
+    limit = result_limit(args.get("limit"))
+    schema = cached_schema(CommentListSchema, many=True)
+    # The full-text index finds the matching comments, which are joined to their child and author in one query
+    matches = comment_matches(words)
+    stmt = (
+        db.select(Comment)
+        .join(matches, Comment.comment_id == matches.c.comment_id)
+        .options(*eager_load(Comment, schema))
+    )
+    # Parents only search the comments about children linked to their account
+    if user_type == "Parent":
+        stmt = stmt.where(
+            Comment.child_id.in_(db.select(Child.id).where(Child.user_id == user_id))
+        )
+    if "urgency" in args:
+        stmt = stmt.where(Comment.urgency == args["urgency"])
+    if "first" in args:
+        stmt = stmt.where(Comment.date_created >= args["first"])
+    if "last" in args:
+        stmt = stmt.where(Comment.date_created <= args["last"])
+    # Equally good matches are returned newest first
+    stmt = stmt.order_by(matches.c.rank, Comment.comment_id.desc()).limit(limit)
+    return fast_dump(schema, db.session.scalars(stmt).all())
@@ -6,6 +6,18 @@ from flask import Blueprint, request
 from models.contact import Contact, ContactSchema
 from init import db
 from auth import user_status
+from eager_loading import eager_load, load_columns
+from schemas import cached_schema
+from fieldsets import sparse_schema
+from serializers import fast_dump
+from conditional import conditional
+from instrumentation import query_budget
+from pagination import collection_response
+from inserts import insert_many
+from bulk import bulk_items, load_items, existing_ids, bulk_response
+from models.user import User
+from models.attendance import Attendance
+from summaries import refresh_enrolment
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 # Initialises flask Blueprint class "contact_bp" and defines url prefix for endpoints defined in with @contacts_bp wrapper
@@ -15,8 +27,12 @@ contacts_bp = Blueprint("contact", __name__, url_prefix="/contacts")
 # GET Contacts
 # Wrapper links function "get_contacts" to endpoint "/contacts" when request is made with GET method
 @contacts_bp.route("/", methods=["GET"])
+# Most SQL statements a request should run, debug mode logs requests exceeding it
+@query_budget(4)
 # Used throughout module, ensures JWT token is sent in request header
 @jwt_required()
+# Answers requests with an unchanged ETag or Last-Modified date with 304 Not Modified
+@conditional(Contact, ContactSchema)
 def get_contacts():
     """Returns multiple contact tuples based on user permissions.
     Endpoint for "GET" "/contacts".
@@ -26,16 +42,26 @@ def get_contacts():
     user_type = user_status(user_id)
     # If user is an "Admin" or "Teacher", a database query selecting all "contact" instances is submitted
     # Returned SQLAlchemy objects are converted to dictionaries via marshmallow and returned to the user
+    # Relationships dumped by the schema are loaded alongside the contacts rather than per contact
+    # Contacts are streamed to the user in batches rather than loaded all at once
+    # Requests with "?limit=" or "?after=" receive one page ordered by id and the next page's cursor
+    # "?fields=" limits the dumped fields, and the selected columns and loaded relationships with them
     if user_type == "Admin" or user_type == "Teacher":
-        stmt = db.select(Contact)
-        contacts = db.session.scalars(stmt).all()
-        return ContactSchema(many=True).dump(contacts)
+        schema = sparse_schema(ContactSchema, many=True)
+        stmt = db.select(Contact).options(
+            *eager_load(Contact, schema), *load_columns(Contact, schema)
+        )
+        return collection_response(stmt, schema, Contact.id)
     # If user is a "Parent", a database query selecting all "contact" instances with a "user_id" matching the JWT id is submitted
     # Returned SQLAlchemy objects are converted to dictionaries via marshmallow and returned to the user
     if user_type == "Parent":
-        stmt = db.select(Contact).where(Contact.user_id == user_id)
-        registered_contacts = db.session.scalars(stmt).all()
-        return ContactSchema(many=True).dump(registered_contacts)
+        schema = sparse_schema(ContactSchema, many=True)
+        stmt = (
+            db.select(Contact)
+            .where(Contact.user_id == user_id)
+            .options(*eager_load(Contact, schema), *load_columns(Contact, schema))
+        )
+        return collection_response(stmt, schema, Contact.id)
     # If the user is not an "Admin" or "Parent" an error message is returned
     else:
         return {"Error": "You are not authorised to access this resource"}, 403
@@ -43,16 +69,23 @@ def get_contacts():
 
 # GET Contact
 @contacts_bp.route("/<int:id>", methods=["GET"])
+@query_budget(4)
 @jwt_required()
+@conditional(Contact, ContactSchema)
 def get_contact(id):
     """Returns single child instance provided user has appropriate permissions.
     Endpoint for "GET" "/contacts/<int>".
     """
     # The database is queried for a "contact" instance with an "id" value matching the submitted URI value
+    # Relationships dumped by the schema are loaded in the same round of queries
     # If no matches are found, a 404 error is raised
-    contact = db.get_or_404(Contact, id)
+    schema = cached_schema(ContactSchema)
+    stmt = (
+        db.select(Contact).where(Contact.id == id).options(*eager_load(Contact, schema))
+    )
+    contact = db.first_or_404(stmt)
     # A returned SQLAlchemy object is converted to a dictionary via marshmallow
-    contact_dict = ContactSchema().dump(contact)
+    contact_dict = fast_dump(schema, contact)
     user_id = get_jwt_identity()
     # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
     user_type = user_status(user_id)
@@ -89,7 +122,8 @@ def register_contact():
             request.json["ph_number"] = "0" + str(request.json["ph_number"])
         # Generates a local contact dict witht he submitted request json
         # marshmallow schema screens these values for inappropriate values
-        contact_info = ContactSchema(
+        contact_info = cached_schema(
+            ContactSchema,
             only=["first_name", "email", "emergency_contact", "ph_number"],
             unknown="exclude",
         ).load(request.json)
@@ -131,11 +165,101 @@ def register_contact():
         # Commits new contact to the database
         db.session.commit()
         # Returns the new contact's dictionary
-        return {"Success": ContactSchema().dump(new_contact)}, 201
+        return {"Success": cached_schema(ContactSchema).dump(new_contact)}, 201
     else:
         return {"Error": "You are not authorised to access this resource"}, 403
 
 
+# POST Contacts in bulk
+@contacts_bp.route("/bulk", methods=["POST"])
+@jwt_required()
+def register_contacts():
+    """Registers a list of contacts in one transaction. Each item is validated like a "POST" "/contacts" body
+    and invalid items are reported by their index without stopping the others.
+    Endpoint for "POST" "/contacts/bulk".
+    """
+    user_id = get_jwt_identity()
+    # The user's permissions are checked once for every contact in the request
+    user_type = user_status(user_id)
+    if user_type != "Admin" and user_type != "Parent":
+        return {"Error": "You are not authorised to access this resource"}, 403
+    items = bulk_items()
+    # Sanitises each submitted "ph_number" value to begin with a "0", as for a single contact
+    for item in items:
+        if isinstance(item, dict) and str(item.get("ph_number", "0"))[:1] != "0":
+            item["ph_number"] = "0" + str(item["ph_number"])
+    # "Admin" users must provide a "user_id" value for every contact
+    required = ["first_name", "email", "emergency_contact", "ph_number"]
+    if user_type == "Admin":
+        required.append("user_id")
+    contact_info, errors = load_items(
+        cached_schema(
+            ContactSchema,
+            only=["first_name", "email", "emergency_contact", "ph_number"],
+            unknown="exclude",
+        ),
+        items,
+        required,
+    )
+    # A single query checks which submitted "user_id" values belong to registered users
+    if user_type == "Admin":
+        user_ids = existing_ids(User.id, [items[index]["user_id"] for index in contact_info])
+    else:
+        user_ids = {user_id}
+    # A single query finds the phone numbers already registered to those users
+    stmt = db.select(Contact.user_id, Contact.ph_number).where(
+        Contact.user_id.in_(user_ids)
+    )
+    registered = set(db.session.execute(stmt).tuples()) if user_ids else set()
+    # Builds each contact's column values, sanitised like a single contact's
+    # A phone number submitted twice for the same user is reported on its later item
+    rows, keys = [], {}
+    for index, info in contact_info.items():
+        row = {
+            "first_name": info["first_name"].capitalize(),
+            "email": info["email"],
+            "ph_number": info["ph_number"],
+            "emergency_contact": info["emergency_contact"],
+            "user_id": items[index]["user_id"] if user_type == "Admin" else user_id,
+        }
+        if not (type(row["user_id"]) is int and row["user_id"] in user_ids):
+            errors[index] = "No such user. Please check 'user_id' matches a registered user"
+            continue
+        key = (row["user_id"], row["ph_number"])
+        if key in registered:
+            errors[index] = "A contact is already registered with this phone number"
+            continue
+        if key in keys:
+            errors[index] = f"This contact has the same phone number as item {keys[key]}"
+            continue
+        keys[key] = index
+        rows.append(row)
+    # The contacts are inserted in batches
+    inserted = insert_many(
+        Contact,
+        rows,
+        [
+            Contact.id,
+            Contact.user_id,
+            Contact.first_name,
+            Contact.emergency_contact,
+            Contact.ph_number,
+            Contact.email,
+        ],
+    )
+    schema = cached_schema(
+        ContactSchema,
+        only=["id", "user_id", "first_name", "emergency_contact", "ph_number", "email"],
+    )
+    created = {}
+    for contact in inserted:
+        index = keys[(contact.user_id, contact.ph_number)]
+        created[index] = {"index": index, **schema.dump(contact)}
+    # Every contact is commited in one transaction
+    db.session.commit()
+    return bulk_response([created[index] for index in sorted(created)], errors)
+
+
 # UPDATE Contact
 @contacts_bp.route("/<int:id>", methods=["PATCH"])
 @jwt_required()
@@ -164,7 +288,8 @@ def update_contact(id):
             ].capitalize()
         # Creates a local dict containing all submitted values to update
         # marshmallow screens the submitted values and returns an error if they are inappropriate
-        new_info = ContactSchema(
+        new_info = cached_schema(
+            ContactSchema,
             only=["first_name", "emergency_contact", "email", "ph_number"],
             unknown="exclude",
         ).load(request.json)
@@ -206,7 +331,12 @@ def delete_contact(id):
     # If the user is not an "Admin", the contact instance's "user_id" value is compared to the id provided in the JWT
     # If the user is authorised, the instance is deleted from the database
     if user_type == "Admin" or contact.user_id == user_id:
+        # Deleting the contact also deletes the attendances they are listed on, so today's summaries of those groups are recounted
+        stmt = db.select(Attendance.group_id).where(Attendance.contact_id == id)
+        group_ids = db.session.scalars(stmt).all()
         db.session.delete(contact)
+        db.session.flush()
+        refresh_enrolment(group_ids)
         # The deletion is committed to the database
         db.session.commit()
         return {"Success": "Contact registration deleted"}, 200
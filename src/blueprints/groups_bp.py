@@ -2,11 +2,29 @@
     Contains blueprint formatting, functions and endpoints for "Group" entities
 """
 
-from flask import Blueprint, request
+from datetime import datetime
+from flask import Blueprint, request, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.group import Group, GroupSchema
+from models.attendance import Attendance, RollCallSchema
+from models.child import Child
+from models.contact import Contact
+from models.user import User
+from models.attendance_event import AttendanceEvent, AttendanceEventSchema
 from init import db
 from auth import admin_check, user_status
+from eager_loading import eager_load, load_columns
+from schemas import cached_schema
+from fieldsets import sparse_schema
+from serializers import fast_dump
+from conditional import conditional, conditional_on
+from instrumentation import query_budget
+from inserts import insert_new, insert_many
+from bulk import bulk_items, load_items, bulk_response
+from pagination import collection_response
+from presence import date_range, daily_presence, weekly_presence
+from summaries import refresh_enrolment, lock_day, record_presence
+from models.attendance_summary import AttendanceSummary, AttendanceSummarySchema
 
 # Initialises flask Blueprint class "groups_bp" and defines url prefix for endpoints defined in with @groups_bp wrapper
 groups_bp = Blueprint("group", __name__, url_prefix="/groups")
@@ -15,8 +33,12 @@ groups_bp = Blueprint("group", __name__, url_prefix="/groups")
 # GET Groups
 # Wrapper links function "get_groups" to endpoint "/groups" when request is made with GET method
 @groups_bp.route("/", methods=["GET"])
+# Most SQL statements a request should run, debug mode logs requests exceeding it
+@query_budget(3)
 # Used throughout module, ensures JWT token is sent in request header
 @jwt_required()
+# Answers requests with an unchanged ETag or Last-Modified date with 304 Not Modified
+@conditional(Group, GroupSchema)
 def get_groups():
     """Returns multiple group tuples based on user permissions.
     Endpoint for "GET" "/groups".
@@ -26,10 +48,16 @@ def get_groups():
     user_type = user_status(user_id)
     # If user is an "Admin", "Teacher" or "Parent", a database query selecting all "group" instances is submitted
     # Returned SQLAlchemy objects are converted to dictionaries via marshmallow and returned to the user
+    # Each group's teacher is joined onto the same query
+    # Groups are streamed to the user in batches rather than loaded all at once
+    # Requests with "?limit=" or "?after=" receive one page ordered by id and the next page's cursor
+    # "?fields=" limits the dumped fields, and the selected columns and loaded relationships with them
     if user_type == "Admin" or user_type == "Teacher" or user_type == "Parent":
-        stmt = db.select(Group)
-        groups = db.session.scalars(stmt).all()
-        return GroupSchema(many=True).dump(groups)
+        schema = sparse_schema(GroupSchema, many=True)
+        stmt = db.select(Group).options(
+            *eager_load(Group, schema), *load_columns(Group, schema)
+        )
+        return collection_response(stmt, schema, Group.id)
     # If the user is not an "Admin", "Teacher" or "Parent" an error message is returned
     else:
         return {"Error": "You are not authorised to access this resource"}, 403
@@ -37,16 +65,21 @@ def get_groups():
 
 # GET Single Group
 @groups_bp.route("/<int:id>", methods=["GET"])
+@query_budget(3)
 @jwt_required()
+@conditional(Group, GroupSchema)
 def get_group(id):
     """Returns single group instance provided user has appropriate permissions.
     Endpoint for "GET" "/groups/<int>".
     """
     # The database is queried for a "group" instance with an "id" value matching the submitted URI value
+    # The group's teacher is joined onto the same query
     # If no matches are found, a 404 error is raised
-    group = db.get_or_404(Group, id)
+    schema = cached_schema(GroupSchema)
+    stmt = db.select(Group).where(Group.id == id).options(*eager_load(Group, schema))
+    group = db.first_or_404(stmt)
     # A returned SQLAlchemy object is converted to a dictionary via marshmallow
-    group_dict = GroupSchema().dump(group)
+    group_dict = fast_dump(schema, group)
 
     user_id = get_jwt_identity()
     # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
@@ -60,6 +93,82 @@ def get_group(id):
         return {"Error": "You are not authorised to access this resource"}, 403
 
 
+# GET Group roster
+@groups_bp.route("/<int:id>/roster", methods=["GET"])
+@query_budget(3)
+@jwt_required()
+@conditional_on(Group, Attendance, Child, Contact, User)
+def get_group_roster(id):
+    """Returns a group with every attending child, their contact for the group and their parent.
+    Endpoint for "GET" "/groups/<int>/roster".
+    """
+    user_id = get_jwt_identity()
+    # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
+    user_type = user_status(user_id)
+    # The roster lists other families' contact details, so only admins and teachers may view it
+    if user_type != "Admin" and user_type != "Teacher":
+        return {"Error": "You are not authorised to access this resource"}, 403
+    # A single query joins the group to its attendances, their children, contacts and the children's parents
+    # The group is outer joined so a group without attendances still returns one row
+    stmt = (
+        db.select(
+            Group.id,
+            Group.group_name,
+            Group.day,
+            Attendance.attendance_id,
+            Child.id.label("child_id"),
+            Child.first_name,
+            Child.last_name,
+            Contact.id.label("contact_id"),
+            Contact.first_name.label("contact_first_name"),
+            Contact.ph_number,
+            Contact.email,
+            Contact.emergency_contact,
+            User.id.label("parent_id"),
+            User.first_name.label("parent_first_name"),
+            User.email.label("parent_email"),
+        )
+        .outerjoin(Attendance, Attendance.group_id == Group.id)
+        .outerjoin(Child, Child.id == Attendance.child_id)
+        .outerjoin(Contact, Contact.id == Attendance.contact_id)
+        .outerjoin(User, User.id == Child.user_id)
+        .where(Group.id == id)
+        .order_by(Child.last_name, Child.first_name, Child.id)
+    )
+    rows = db.session.execute(stmt).all()
+    # If no group has the submitted id, a 404 error is raised
+    if not rows:
+        abort(404)
+    roster = {
+        "id": rows[0].id,
+        "group_name": rows[0].group_name,
+        "day": rows[0].day,
+        "children": [
+            {
+                "attendance_id": row.attendance_id,
+                "id": row.child_id,
+                "first_name": row.first_name,
+                "last_name": row.last_name,
+                "contact": {
+                    "id": row.contact_id,
+                    "first_name": row.contact_first_name,
+                    "ph_number": row.ph_number,
+                    "email": row.email,
+                    "emergency_contact": row.emergency_contact,
+                },
+                "parent": {
+                    "id": row.parent_id,
+                    "first_name": row.parent_first_name,
+                    "email": row.parent_email,
+                },
+            }
+            for row in rows
+            if row.attendance_id is not None
+        ],
+    }
+    return roster
+
+
 # POST Group
 @groups_bp.route("/", methods=["POST"])
 @jwt_required()
@@ -73,40 +182,245 @@ def register_group():
     request.json["day"] = request.json["day"].capitalize()
     # Generates a local contact dict with the submitted request json
     # marshmallow schema screens these values for inappropriate values
-    group_info = GroupSchema(only=["group_name", "day"], unknown="exclude").load(
-        request.json
-    )
-    # Creates a local Contact SQLAlchemy Group object
-    new_group = Group(
-        group_name=group_info["group_name"].capitalize(),
-        day=group_info["day"],
-        teacher_id=int(request.json["teacher_id"]),
-    )
+    group_info = cached_schema(
+        GroupSchema, only=["group_name", "day"], unknown="exclude"
+    ).load(request.json)
+    # Creates a dictionary of the new group's column values
+    new_group = {
+        "group_name": group_info["group_name"].capitalize(),
+        "day": group_info["day"],
+        "teacher_id": int(request.json["teacher_id"]),
+    }
     # Checks if the user is an admin
     # If they are not, the function returns a 403
     if admin_check(user_id):
-        # Generates and submits a request to the database to see if a group with the submitted group name and day value exists
-        # Checks if a group with the same group name and day already exists
-        stmt = db.select(Group).where(
-            Group.group_name == new_group.group_name,
-            Group.day == new_group.day,
-        )
-        group = db.session.scalar(stmt)
+        # Inserts the group unless a group with the same group name and day already exists
+        group = insert_new(Group, ["group_name", "day"], **new_group)
         # If a group exists with these values, a 400 error is returned
-        if group:
+        if group is None:
             return {
                 "Error": "A group is already registered with this name and day"
             }, 400
-        # Stages and commits new group to the database
-        db.session.add(new_group)
+        # The inserted row is converted to a dictionary before committing, so it is not reloaded
+        group_dict = cached_schema(GroupSchema).dump(group)
         db.session.commit()
         # Returns the saved group instance as a dictionary
-        return {"Success": GroupSchema().dump(new_group)}, 201
+        return {"Success": group_dict}, 201
 
     else:
         return {"Error": "You are not authorised to access this resource"}, 403
 
 
+# POST Group roll call
+@groups_bp.route("/<int:id>/attendances", methods=["POST"])
+@jwt_required()
+def register_roll_call(id):
+    """Registers a list of children's attendances in a group, each given as a "child_id" and "contact_id".
+    Each item is checked like a "POST" "/children/<int>/attendances" body, with one query for all the children
+    and one for all the contacts, and the valid attendances are inserted together.
+    Invalid items are reported by their index without stopping the others.
+    Endpoint for "POST" "/groups/<int>/attendances".
+    """
+    user_id = get_jwt_identity()
+    # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
+    user_type = user_status(user_id)
+    # Teachers are not permitted to generate attendances
+    if user_type != "Admin" and user_type != "Parent":
+        return {"Error": "You are not authorised to access this resource"}, 403
+    # If no group has the submitted id, a 404 error is raised
+    db.get_or_404(Group, id)
+    items = bulk_items()
+    roll, errors = load_items(cached_schema(RollCallSchema), items, [])
+    # The owners of every submitted child and contact are found with one query each
+    child_ids = {item["child_id"] for item in roll.values()}
+    contact_ids = {item["contact_id"] for item in roll.values()}
+    stmt = db.select(Child.id, Child.user_id).where(Child.id.in_(child_ids))
+    child_owners = dict(db.session.execute(stmt).tuples().all()) if child_ids else {}
+    stmt = db.select(Contact.id, Contact.user_id).where(Contact.id.in_(contact_ids))
+    contact_owners = dict(db.session.execute(stmt).tuples().all()) if contact_ids else {}
+    # Parents may only register their own children with their own contacts
+    # A child submitted twice is reported on its later item
+    rows, indexes = [], {}
+    for index, item in roll.items():
+        child_id, contact_id = item["child_id"], item["contact_id"]
+        if child_id not in child_owners:
+            errors[index] = "No such child. Please check 'child_id' matches a registered child"
+        elif user_type == "Parent" and child_owners[child_id] != user_id:
+            errors[index] = "You are not authorised to access this resource"
+        elif contact_id not in contact_owners:
+            errors[index] = "No such contact. Please check 'contact_id' matches a registered contact"
+        elif user_type == "Parent" and contact_owners[contact_id] != user_id:
+            errors[index] = "Please enter a contact_id registered to your account"
+        elif child_id in indexes:
+            errors[index] = f"This child is the same as item {indexes[child_id]}"
+        else:
+            indexes[child_id] = index
+            rows.append({"child_id": child_id, "group_id": id, "contact_id": contact_id})
+    # The attendances are inserted together, skipping children already registered for the group
+    inserted = insert_many(
+        Attendance,
+        rows,
+        [Attendance.attendance_id, Attendance.child_id, Attendance.contact_id],
+        ["child_id", "group_id"],
+    )
+    created = {}
+    for attendance in inserted:
+        index = indexes.pop(attendance.child_id)
+        created[index] = {
+            "index": index,
+            "attendance_id": attendance.attendance_id,
+            "child_id": attendance.child_id,
+            "contact_id": attendance.contact_id,
+        }
+    for index in indexes.values():
+        errors[index] = "Child attendance is already registered for that group"
+    # Today's attendance summary of the group counts the new enrolments
+    if inserted:
+        refresh_enrolment([id])
+    db.session.commit()
+    return bulk_response([created[index] for index in sorted(created)], errors)
+
+
+# POST Group sign in and sign out events
+@groups_bp.route("/<int:id>/events", methods=["POST"])
+@jwt_required()
+def record_events(id):
+    """Records children signing in to or out of a group now, given as a list of "child_id" and "kind" items.
+    "kind" is "sign_in" or "sign_out". Events are only ever added, never changed.
+    Invalid items are reported by their index without stopping the others.
+    Endpoint for "POST" "/groups/<int>/events".
+    """
+    user_id = get_jwt_identity()
+    # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
+    user_type = user_status(user_id)
+    # Children are signed in and out by staff
+    if user_type != "Admin" and user_type != "Teacher":
+        return {"Error": "You are not authorised to access this resource"}, 403
+    # If no group has the submitted id, a 404 error is raised
+    db.get_or_404(Group, id)
+    items = bulk_items()
+    events, errors = load_items(cached_schema(AttendanceEventSchema), items, [])
+    # A single query finds which of the submitted children attend the group
+    child_ids = {event["child_id"] for event in events.values()}
+    stmt = db.select(Attendance.child_id).where(
+        Attendance.group_id == id, Attendance.child_id.in_(child_ids)
+    )
+    attending = set(db.session.scalars(stmt)) if child_ids else set()
+    # Every event in the request is recorded at the same time
+    now = datetime.now()
+    rows, indexes = [], {}
+    for index, event in events.items():
+        key = (event["child_id"], event["kind"])
+        if event["child_id"] not in attending:
+            errors[index] = "This child does not attend this group"
+        elif key in indexes:
+            errors[index] = f"This event is the same as item {indexes[key]}"
+        else:
+            indexes[key] = index
+            rows.append(
+                {
+                    "child_id": event["child_id"],
+                    "group_id": id,
+                    "kind": event["kind"],
+                    "day": now.date(),
+                    "ts": now,
+                    "user_id": user_id,
+                }
+            )
+    # Requests signing children in to the group today take turns, so none miss another's sign ins when recounting
+    signing_in = any(row["kind"] == "sign_in" for row in rows)
+    if signing_in:
+        lock_day(id, now.date())
+    inserted = insert_many(
+        AttendanceEvent,
+        rows,
+        [AttendanceEvent.event_id, AttendanceEvent.child_id, AttendanceEvent.kind, AttendanceEvent.ts],
+    )
+    created = {}
+    for event in inserted:
+        index = indexes[(event.child_id, event.kind)]
+        created[index] = {
+            "index": index,
+            "event_id": event.event_id,
+            "child_id": event.child_id,
+            "kind": event.kind,
+            "ts": event.ts.isoformat(),
+        }
+    # Today's "present" and "late" counts of the group are recounted from its sign ins
+    if signing_in:
+        record_presence(id, now.date())
+    db.session.commit()
+    return bulk_response([created[index] for index in sorted(created)], errors)
+
+
+# GET Group daily presence
+@groups_bp.route("/<int:id>/presence/daily", methods=["GET"])
+@query_budget(3)
+@jwt_required()
+def get_daily_presence(id):
+    """Returns how many children signed in to and out of a group on each day from "?from=" to "?to=".
+    Defaults to the last 7 days. Days without events are left out.
+    Endpoint for "GET" "/groups/<int>/presence/daily".
+    """
+    user_id = get_jwt_identity()
+    # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
+    user_type = user_status(user_id)
+    if user_type != "Admin" and user_type != "Teacher":
+        return {"Error": "You are not authorised to access this resource"}, 403
+    first, last = date_range(7)
+    # If no group has the submitted id, a 404 error is raised
+    db.get_or_404(Group, id)
+    return daily_presence(id, first, last)
+
+
+# GET Group weekly presence
+@groups_bp.route("/<int:id>/presence/weekly", methods=["GET"])
+@query_budget(3)
+@jwt_required()
+def get_weekly_presence(id):
+    """Returns how many children signed in to a group in each week from "?from=" to "?to=", and their total days present.
+    Defaults to the last 8 weeks. Weeks start on Monday and weeks without events are left out.
+    Endpoint for "GET" "/groups/<int>/presence/weekly".
+    """
+    user_id = get_jwt_identity()
+    # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
+    user_type = user_status(user_id)
+    if user_type != "Admin" and user_type != "Teacher":
+        return {"Error": "You are not authorised to access this resource"}, 403
+    first, last = date_range(56)
+    # If no group has the submitted id, a 404 error is raised
+    db.get_or_404(Group, id)
+    return weekly_presence(id, first, last)
+
+
+# GET Group attendance summaries
+@groups_bp.route("/<int:id>/summaries", methods=["GET"])
+@query_budget(3)
+@jwt_required()
+def get_summaries(id):
+    """Returns a group's enrolled, present, absent and late counts for each day from "?from=" to "?to=".
+    Defaults to the last 7 days. Counts are read from the maintained summary rows, days without a row are left out.
+    Endpoint for "GET" "/groups/<int>/summaries".
+    """
+    user_id = get_jwt_identity()
+    # Creates local variable storing "Admin", "Parent" or "Teacher" for later permission checks
+    user_type = user_status(user_id)
+    if user_type != "Admin" and user_type != "Teacher":
+        return {"Error": "You are not authorised to access this resource"}, 403
+    first, last = date_range(7)
+    # If no group has the submitted id, a 404 error is raised
+    db.get_or_404(Group, id)
+    # The rows are read through the primary key, without scanning attendances or events
+    stmt = (
+        db.select(AttendanceSummary)
+        .where(AttendanceSummary.group_id == id, AttendanceSummary.day.between(first, last))
+        .order_by(AttendanceSummary.day)
+    )
+    return fast_dump(
+        cached_schema(AttendanceSummarySchema, many=True), db.session.scalars(stmt).all()
+    )
+
+
 # UPDATE Group
 @groups_bp.route("/<int:id>", methods=["PATCH"])
 @jwt_required()
@@ -123,7 +437,8 @@ def update_group(id):
         request.json["day"] = request.json["day"].capitalize()
     # Creates a local dict containing all submitted values to update
     # marshmallow screens the submitted values and returns an error if they are inappropriate
-    new_info = GroupSchema(
+    new_info = cached_schema(
+        GroupSchema,
         only=["group_name", "day"],
         unknown="exclude",
     ).load(request.json)
@@ -180,7 +495,10 @@ def delete_group(id):
         # Queries the database for a group instance with "id" value matching the submitted URI value
         # If no matches are found, a 404 error is raised
         group = db.get_or_404(Group, id)
-        # Stages deleting the returned group
+        # Stages deleting the returned group and its attendance summaries
+        db.session.execute(
+            db.delete(AttendanceSummary).where(AttendanceSummary.group_id == id)
+        )
         db.session.delete(group)
         # The deletion is committed to the database
         db.session.commit()
@@ -5,8 +5,18 @@
 from flask import Blueprint, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.teacher import Teacher, TeacherSchema
+from models.group import Group
+from models.attendance_summary import AttendanceSummary
 from init import db
 from auth import admin_check
+from eager_loading import eager_load, load_columns
+from schemas import cached_schema
+from fieldsets import sparse_schema
+from serializers import fast_dump
+from conditional import conditional
+from instrumentation import query_budget
+from inserts import insert_new
+from pagination import collection_response
 
 # Initialises flask Blueprint class "teachers_bp"
 # Defines url prefix for endpoints defined in with @teachers_bp wrapper
@@ -16,18 +26,26 @@ teachers_bp = Blueprint("teacher", __name__, url_prefix="/teachers")
 # GET Teachers
 # Wrapper links function "get_teachers" to endpoint "/teacherss" when request is made with GET method
 @teachers_bp.route("/", methods=["GET"])
+# Most SQL statements a request should run, debug mode logs requests exceeding it
+@query_budget(4)
 @jwt_required()
+# Answers requests with an unchanged ETag or Last-Modified date with 304 Not Modified
+@conditional(Teacher, TeacherSchema)
 def get_teachers():
     # Sets the user_id var to the id in the header JWT
     user_id = get_jwt_identity()
     # Checks if the user is an admin or returns a 403
     if admin_check(user_id):
+        schema = sparse_schema(TeacherSchema, many=True)
         # Generates an SQL query selecting all teacher instances
-        stmt = db.select(Teacher)
-        # Submits query
-        teachers = db.session.scalars(stmt).all()
-        # Returns all teacher SQL objects as a JSON via marshmallow schema
-        return TeacherSchema(many=True).dump(teachers)
+        # Each teacher's groups are loaded with one additional query
+        stmt = db.select(Teacher).options(
+            *eager_load(Teacher, schema), *load_columns(Teacher, schema)
+        )
+        # Streams all teacher SQL objects as a JSON via marshmallow schema in batches
+        # Returns one page and the next page's cursor if "?limit=" or "?after=" is given
+        # "?fields=" limits the dumped fields, and the selected columns and loaded relationships with them
+        return collection_response(stmt, schema, Teacher.id)
     # If the user is not an admin, an error message is returned
     else:
         return {"Error": "You are not authorised to access this resource"}, 403
@@ -35,16 +53,23 @@ def get_teachers():
 
 # GET Teacher
 @teachers_bp.route("/<int:id>", methods=["GET"])
+@query_budget(4)
 @jwt_required()
+@conditional(Teacher, TeacherSchema)
 def get_teacher(id):
     """Returns single teacher instance provided user has appropriate permissions.
     Endpoint for "GET" "/teachers/<int>".
     """
     # The database is queried for a "teacher" instance with an "id" value matching the submitted URI value
+    # The teacher's groups are loaded in the same round of queries
     # If no matches are found, a 404 error is raised
-    teacher = db.get_or_404(Teacher, id)
+    schema = cached_schema(TeacherSchema)
+    stmt = (
+        db.select(Teacher).where(Teacher.id == id).options(*eager_load(Teacher, schema))
+    )
+    teacher = db.first_or_404(stmt)
     # A returned SQLAlchemy object is converted to a dictionary via marshmallow
-    teacher_dict = TeacherSchema().dump(teacher)
+    teacher_dict = fast_dump(schema, teacher)
     # Assigns the JWT id to a local var
     user_id = get_jwt_identity()
     # If the user is an admin, the dict is returned
@@ -68,29 +93,25 @@ def register_teacher():
     if admin_check(user_id):
         # Generates a local teacher dict with the submitted request json
         # marshmallow schema screens these values for inappropriate values
-        teacher_info = TeacherSchema(
-            only=["first_name", "email"], unknown="exclude"
+        teacher_info = cached_schema(
+            TeacherSchema, only=["first_name", "email"], unknown="exclude"
         ).load(request.json)
-        # Creates a local Contact SQLAlchemy Teacher object
+        # Inserts the teacher unless one is already registered with the same name and email
         # Sanitises the "first_name" value to be capital
-        new_teacher = Teacher(
+        new_teacher = insert_new(
+            Teacher,
+            ["first_name", "email"],
             first_name=teacher_info["first_name"].capitalize(),
             email=teacher_info["email"],
         )
-        # Queries the database for a teacher registered with the submitted email
-        stmt = db.select(Teacher).where(
-            Teacher.first_name == new_teacher.first_name,
-            Teacher.email == new_teacher.email,
-        )
-        registered_teacher = db.session.scalar(stmt)
         # If a teacher is already recorded with the submitted email, a 400 error is returned
-        if registered_teacher:
+        if new_teacher is None:
             return {"Error": "A teacher is already registered with this email"}, 400
-        # The newly generated teacher is staged and commited to the database
-        db.session.add(new_teacher)
+        # The inserted row is converted to a dictionary before committing, so it is not reloaded
+        teacher_dict = cached_schema(TeacherSchema).dump(new_teacher)
         db.session.commit()
         # Returns the saved group instance as a dictionary
-        return {"Success": TeacherSchema().dump(new_teacher)}, 201
+        return {"Success": teacher_dict}, 201
     # An error is returned for unauthorised users
     else:
         return {"Error": "You are not authorised to access this resource"}, 403
@@ -117,7 +138,8 @@ def update_teacher(id):
             return {"Error": "A teacher is already registered with this email"}, 400
     # Creates a local dict containing all submitted values to update
     # marshmallow screens the submitted values and returns an error if they are inappropriate
-    new_info = TeacherSchema(
+    new_info = cached_schema(
+        TeacherSchema,
         only=["email", "first_name"],
         unknown="exclude",
     ).load(request.json)
@@ -158,7 +180,14 @@ def delete_teacher(id):
         # Queries the database for a teacher instance with "id" value matching the submitted URI value
         # If no matches are found, a 404 error is raised
         teacher = db.get_or_404(Teacher, id)
-        # Stages deleting the returned teacher
+        # Stages deleting the returned teacher and the attendance summaries of the groups deleted with them
+        db.session.execute(
+            db.delete(AttendanceSummary).where(
+                AttendanceSummary.group_id.in_(
+                    db.select(Group.id).where(Group.teacher_id == id)
+                )
+            )
+        )
         db.session.delete(teacher)
         # The deletion is committed to the database
         db.session.commit()
@@ -1,11 +1,35 @@
-from datetime import timedelta
 from flask import Blueprint, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask_jwt_extended import create_access_token
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, get_jti
 from models.user import User, UserSchema
-from init import db, bcrypt
-from auth import admin_check, user_status
-
+from models.refresh_token import RefreshToken
+from models.child import Child
+from models.attendance import Attendance
+from models.contact import Contact
+from models.attendance_event import AttendanceEvent
+from init import db
+from hashing import hash_password, hash_passwords, check_password, needs_rehash
+from eager_loading import eager_load, load_columns
+from schemas import cached_schema
+from fieldsets import sparse_schema
+from serializers import fast_dump
+from conditional import conditional
+from instrumentation import query_budget
+from inserts import insert_new, insert_many
+from bulk import bulk_items, load_items, bulk_response
+from pagination import collection_response
+from summaries import refresh_enrolment
+from auth import (
+    admin_check,
+    user_status,
+    user_roles,
+    role_claims,
+    create_tokens,
+    revoke_refresh_tokens,
+    bump_role_version,
+    cache_user_roles,
+    cache_deleted_user,
+    role_cache,
+)
 
 # Initialises flask Blueprint class "users_bp"
 # Defines url prefix for endpoints defined in with @users_bp wrapper
@@ -23,7 +47,7 @@ def login():
         return {"Error": "Incorrect email or password"}, 400
     # Creates a local dict containing submitted login credentials
     # marshmallow screens the submitted values and returns an error if they are inappropriate
-    params = UserSchema(only=["email", "password"]).load(
+    params = cached_schema(UserSchema, only=["email", "password"]).load(
         request.json, unknown="exclude"
     )
     # Checks the database for a user with the provided email
@@ -32,18 +56,72 @@ def login():
     # If a user with the submitted email exists
     # The submitted "password" value is hashed and compared to the recorded hashed password
     # If they are equal, the user is returned a JWT token
-    if user and bcrypt.check_password_hash(user.password, params["password"]):
-        token = create_access_token(identity=user.id, expires_delta=timedelta(hours=2))
-        return {"token": token}
+    # The token carries the user's roles as signed claims so later requests can skip the database
+    if user and check_password(user.password, params["password"]):
+        # Rehashes the password if it was stored with a different bcrypt cost than is configured
+        if needs_rehash(user.password):
+            user.password = hash_password(params["password"])
+        # A refresh token is also returned so the client can renew its token without a password
+        token, refresh_token = create_tokens(user.id, role_claims(user))
+        db.session.commit()
+        return {"token": token, "refresh_token": refresh_token}
     # If a user with the email value does not exist or the password is incorrect
     # A 401 error is returned
     else:
         return {"Error": "Incorrect email or password"}, 401
 
 
+# REFRESH token
+@users_bp.route("/refresh", methods=["POST"])
+# Mandates a refresh token rather than an access token in the request header
+@jwt_required(refresh=True)
+def refresh():
+    """Returns a new JWT token and rotates the refresh token without checking a password.
+    Endpoint for "POST" "users/refresh".
+    """
+    user_id = get_jwt_identity()
+    # Retrieves the stored record of the submitted refresh token
+    stored_token = db.session.get(RefreshToken, get_jwt()["jti"])
+    if not stored_token:
+        return {"Error": "Invalid refresh token. Please log in again"}, 401
+    # A revoked token being reused suggests it was stolen
+    # Every refresh token of the user is revoked so both holders must log in again
+    if stored_token.revoked:
+        revoke_refresh_tokens(user_id)
+        db.session.commit()
+        return {"Error": "Invalid refresh token. Please log in again"}, 401
+    # The new token carries the user's current roles, or the user has been deleted
+    roles = user_roles(user_id)
+    if roles is None:
+        return {"Error": "Invalid refresh token. Please log in again"}, 401
+    token, refresh_token = create_tokens(user_id, roles)
+    # The submitted refresh token is revoked and linked to its replacement
+    stored_token.revoked = True
+    stored_token.replaced_by = get_jti(refresh_token)
+    db.session.commit()
+    return {"token": token, "refresh_token": refresh_token}
+
+
+# LOGOUT
+@users_bp.route("/logout", methods=["POST"])
+@jwt_required(refresh=True)
+def logout():
+    """Revokes the submitted refresh token.
+    Endpoint for "POST" "users/logout".
+    """
+    stored_token = db.session.get(RefreshToken, get_jwt()["jti"])
+    if stored_token:
+        stored_token.revoked = True
+        db.session.commit()
+    return {"Success": "Refresh token revoked"}, 200
+
+
 # Get All Users
 @users_bp.route("/", methods=["GET"])
+@query_budget(6)
 @jwt_required()
+# Answers requests with an unchanged ETag or Last-Modified date with 304 Not Modified
+@conditional(User, UserSchema, exclude=["password"])
 def get_users():
     """Returns all user tuples if user has admin authentication.
     Endpoint for "GET" "/users".
@@ -52,21 +130,42 @@ def get_users():
     user_id = get_jwt_identity()
     # Checks if the user is an admin or returns a 403
     if admin_check(user_id):
+        schema = sparse_schema(UserSchema, many=True, exclude=["password"])
         # Generates an SQL query selecting all user instances
-        stmt = db.select(User)
-        # Submits query
-        users = db.session.scalars(stmt).all()
-        # Returns all user SQL objects as a JSON via marshmallow schema
+        # Children, contacts and the contacts' attendances are loaded alongside the users
+        stmt = db.select(User).options(
+            *eager_load(User, schema), *load_columns(User, schema)
+        )
+        # Streams all user SQL objects as a JSON via marshmallow schema in batches
+        # Returns one page and the next page's cursor if "?limit=" or "?after=" is given
+        # "?fields=" limits the dumped fields, and the selected columns and loaded relationships with them
         # Returned dict does not contain "password" values
-        return UserSchema(many=True, exclude=["password"]).dump(users)
+        return collection_response(stmt, schema, User.id)
     # If the user is not an admin, an error message is returned
     else:
         return {"Error": "You are not authorised to access this resource"}, 403
 
 
+# GET Role cache statistics
+@users_bp.route("/role-cache", methods=["GET"])
+@jwt_required()
+def get_role_cache_stats():
+    """Returns hit and miss counters for the responding worker's user role cache.
+    Endpoint for "GET" "/users/role-cache".
+    """
+    user_id = get_jwt_identity()
+    # Checks if the user is an admin or returns a 403
+    if admin_check(user_id):
+        return role_cache.stats()
+    else:
+        return {"Error": "You are not authorised to access this resource"}, 403
+
+
 # GET One User
 @users_bp.route("/<int:id>", methods=["GET"])
+@query_budget(6)
 @jwt_required()
+@conditional(User, UserSchema, exclude=["password"])
 def get_user(id):
     """Returns single user instance provided user is an admin.
     Endpoint for "GET" "/users/<int>".
@@ -76,20 +175,26 @@ def get_user(id):
     user_type = user_status(user_id)
     # If the user is an "Admin", the user's request is authorised to proceed
     if user_type == "Admin":
+        schema = cached_schema(UserSchema, exclude=["password"])
         # The database is queried for a "user" instance with an "id" value matching the submitted URI value
         # If no matches are found, a 404 error is raised
-        user = db.get_or_404(User, id)
+        stmt = db.select(User).where(User.id == id).options(*eager_load(User, schema))
+        user = db.first_or_404(stmt)
         # Returns a dict containing all user values except "password"
-        return UserSchema(exclude=["password"]).dump(user)
+        return fast_dump(schema, user)
     # Checks if the user is a parent or teacher user type
     if user_type == "Parent" or user_type == "Teacher":
+        schema = cached_schema(
+            UserSchema, exclude=["password", "is_admin", "is_teacher"]
+        )
         # The database is queried for a "user" instance with an "id" value matching the submitted URI value
         # If no matches are found, a 404 error is raised
-        user = db.get_or_404(User, id)
+        stmt = db.select(User).where(User.id == id).options(*eager_load(User, schema))
+        user = db.first_or_404(stmt)
         # Checks the returned user has the same "id" value as the requesting users JWT id
         if user.id == user_id:
             # Returns a dict containing all user values except "password", "is_admin" and "is_teacher"
-            return UserSchema(exclude=["password", "is_admin", "is_teacher"]).dump(user)
+            return fast_dump(schema, user)
         else:
             return {"Error": "You are not authorised to access this resource"}, 403
     else:
@@ -110,47 +215,123 @@ def create_user_admin():
     user_type = user_status(user_id)
     # Checks if the user is an admin or returns a 403 error
     if user_type == "Admin":
-        # Queries the database for a user registered with the submitted email
-        stmt = db.select(User).where(User.email == request.json["email"])
-        user = db.session.scalar(stmt)
-        # If a user is already recorded with the submitted email, a 400 error is returned
-        if user:
-            return {
-                "Error": "Email already registered. Please provide a unique email address"
-            }, 400
         # Generates a local user dict with the submitted request JSON
         # marshmallow schema screens these values for inappropriate values
-        input_info = UserSchema(
+        input_info = cached_schema(
+            UserSchema,
             only=["email", "first_name", "password", "is_admin", "is_teacher"],
             unknown="exclude",
         ).load(request.json)
-        # Creates a local Contact SQLAlchemy User object using submitted body JSON values
+        # A registered email is reported before the password is hashed, so duplicates do not cost a hash
+        stmt = db.select(User.id).where(User.email == input_info["email"])
+        if db.session.scalar(stmt) is not None:
+            return {
+                "Error": "Email already registered. Please provide a unique email address"
+            }, 400
+        # Inserts a user using submitted body JSON values unless the email was registered since it was checked
         # Hashes the provided "password" value
         # Sanitises the "first_name" value to be capital
         # Converts the "is_admin" and "is_teacher" to booleans
-        new_user = User(
+        new_user = insert_new(
+            User,
+            ["email"],
             email=input_info["email"],
-            password=bcrypt.generate_password_hash(input_info["password"]).decode(
-                "utf-8"
-            ),
+            password=hash_password(input_info["password"]),
             first_name=input_info["first_name"].capitalize(),
             is_admin=str(input_info["is_admin"]).capitalize() in ["True"],
             is_teacher=str(input_info["is_teacher"]).capitalize() in ["True"],
         )
-        # The newly generated user is staged and commited to the database
-        db.session.add(new_user)
+        # If a concurrent request registered the email first, the same 400 error is returned
+        if new_user is None:
+            return {
+                "Error": "Email already registered. Please provide a unique email address"
+            }, 400
+        # The inserted row is read before committing, so it is not reloaded
+        new_user_id, claims = new_user.id, role_claims(new_user)
+        user_dict = cached_schema(
+            UserSchema, only=["email", "first_name", "is_admin", "is_teacher"]
+        ).dump(new_user)
         db.session.commit()
+        # Replaces any cached entry for the new user's id, e.g. a record of a deleted user
+        role_cache.set(new_user_id, claims)
         # Returns the saved User instance as a dictionary
-        return {
-            "Success": UserSchema(
-                only=["email", "first_name", "is_admin", "is_teacher"]
-            ).dump(new_user)
-        }, 201
+        return {"Success": user_dict}, 201
     # An error is returned for unauthorised users
     else:
         return {"Error": "You are not authorised to access this resource"}, 403
 
 
+# POST Users in bulk, Admin Auth
+@users_bp.route("/admin/bulk", methods=["POST"])
+@jwt_required()
+def create_users_admin():
+    """Creates a list of users in one transaction. Each item is validated like a "POST" "/users/admin" body
+    and invalid items are reported by their index without stopping the others.
+    Endpoint for "POST" "/users/admin/bulk".
+    """
+    user_id = get_jwt_identity()
+    # The user's permissions are checked once for every user in the request
+    user_type = user_status(user_id)
+    if user_type != "Admin":
+        return {"Error": "You are not authorised to access this resource"}, 403
+    # Fewer users than other records are accepted, as each password takes a bcrypt hash
+    items = bulk_items("BULK_MAX_USERS")
+    required = ["email", "first_name", "password", "is_admin", "is_teacher"]
+    input_info, errors = load_items(
+        cached_schema(UserSchema, only=required, unknown="exclude"), items, required
+    )
+    # A single query finds the submitted emails that are already registered
+    # They are reported before any password is hashed
+    emails = {info["email"] for info in input_info.values()}
+    stmt = db.select(User.email).where(User.email.in_(emails))
+    registered = set(db.session.scalars(stmt)) if emails else set()
+    indexes = {}
+    for index, info in input_info.items():
+        if info["email"] in registered:
+            errors[index] = "Email already registered. Please provide a unique email address"
+        elif info["email"] in indexes:
+            errors[index] = f"This email is the same as item {indexes[info['email']]}"
+        else:
+            indexes[info["email"]] = index
+    # Ends the read transaction and returns its connection to the pool while the passwords are hashed
+    db.session.close()
+    # Passwords are hashed in parallel by the hashing workers
+    passwords = hash_passwords(
+        [input_info[index]["password"] for index in indexes.values()]
+    )
+    # Builds each user's column values, sanitised like a single user's
+    rows = [
+        {
+            "email": email,
+            "password": password,
+            "first_name": input_info[index]["first_name"].capitalize(),
+            "is_admin": str(input_info[index]["is_admin"]).capitalize() in ["True"],
+            "is_teacher": str(input_info[index]["is_teacher"]).capitalize() in ["True"],
+        }
+        for (email, index), password in zip(indexes.items(), passwords)
+    ]
+    # The users are inserted in batches, skipping any email registered since it was checked
+    inserted = insert_many(
+        User,
+        rows,
+        [User.id, User.email, User.first_name, User.is_admin, User.is_teacher, User.role_version],
+        ["email"],
+    )
+    schema = cached_schema(UserSchema, only=["id", "email", "first_name", "is_admin", "is_teacher"])
+    created = {}
+    for user in inserted:
+        index = indexes.pop(user.email)
+        created[index] = {"index": index, **schema.dump(user)}
+    for index in indexes.values():
+        errors[index] = "Email already registered. Please provide a unique email address"
+    # Every user is commited in one transaction
+    db.session.commit()
+    # Replaces any cached entries for the new users' ids, e.g. records of deleted users
+    for user in inserted:
+        role_cache.set(user.id, role_claims(user))
+    return bulk_response([created[index] for index in sorted(created)], errors)
+
+
 # POST User, no auth
 @users_bp.route("/", methods=["POST"])
 def create_user():
@@ -158,33 +339,39 @@ def create_user():
     For users without an account yet and no authentication.
     Endpoint for "POST" "/users".
     """
-    # Queries the database for a user registered with the submitted email
-    stmt = db.select(User).where(User.email == request.json["email"])
-    user = db.session.scalar(stmt)
-    # If a user is already recorded with the submitted email, a 400 error is returned
-    if user:
-        return {
-            "Error": "This email is already registered to a user. Please provide a unique email address"
-        }, 400
     # Generates a local user dict with the submitted request JSON
     # marshmallow schema screens these values for inappropriate values
-    input_info = UserSchema(
+    input_info = cached_schema(
+        UserSchema,
         only=["email", "first_name", "password"],
         unknown="exclude",
     ).load(request.json)
-    # Creates a local Contact SQLAlchemy User object using submitted body JSON values
+    # A registered email is reported before the password is hashed, so duplicate sign ups do not cost a hash
+    stmt = db.select(User.id).where(User.email == input_info["email"])
+    if db.session.scalar(stmt) is not None:
+        return {
+            "Error": "This email is already registered to a user. Please provide a unique email address"
+        }, 400
+    # Inserts a user using submitted body JSON values unless the email was registered since it was checked
     # Hashes the provided "password" value
     # Sanitises the "first_name" value to be capital
-    new_user = User(
+    new_user = insert_new(
+        User,
+        ["email"],
         email=input_info["email"],
-        password=bcrypt.generate_password_hash(input_info["password"]).decode("utf-8"),
+        password=hash_password(input_info["password"]),
         first_name=input_info["first_name"].capitalize(),
     )
-    # The newly generated user is staged and commited to the database
-    db.session.add(new_user)
+    # If a concurrent request registered the email first, the same 400 error is returned
+    if new_user is None:
+        return {
+            "Error": "This email is already registered to a user. Please provide a unique email address"
+        }, 400
+    # The inserted row is converted to a dictionary before committing, so it is not reloaded
+    user_dict = cached_schema(UserSchema, only=["email", "first_name"]).dump(new_user)
     db.session.commit()
     # Returns the saved User instance as a dictionary
-    return {"Success": UserSchema(only=["email", "first_name"]).dump(new_user)}, 201
+    return {"Success": user_dict}, 201
 
 
 # PATCH User
@@ -218,7 +405,8 @@ def update_user(id):
         request.json["is_teacher"] = request.json["is_teacher"].capitalize()
     # Creates a local dict containing all submitted values to update
     # marshmallow screens the submitted values and returns an error if they are inappropriate
-    new_info = UserSchema(
+    new_info = cached_schema(
+        UserSchema,
         only=["email", "first_name", "is_admin", "is_teacher", "password"],
         unknown="exclude",
     ).load(request.json)
@@ -239,26 +427,33 @@ def update_user(id):
         # Checks if password was contained in user request
         if "password" in request.json:
             # Hashes submitted "password value"
-            new_password = bcrypt.generate_password_hash(
-                request.json["password"]
-            ).decode("utf-8")
+            new_password = hash_password(request.json["password"])
             # Sets retrieved SQLAlchemy tuple "password" value to new provided value
             user.password = new_password
+            # Refresh tokens issued under the old password stop working
+            revoke_refresh_tokens(user.id)
             # Updates new_info dict to note that password was updated
             new_info.update({"password": "Password successfully updated"})
 
         # Checks if the user is an admin
         if user_type == "Admin":
-            # Sets retrieved SQLAlchemy tuple "is_admin" value to new provided value
+            # Reads the new "is_admin" value
             # If no value is provided, "is_admin" value remains as it was
-            user.is_admin = str(request.json.get("is_admin", user.is_admin)) in ["True"]
-            # Sets retrieved SQLAlchemy tuple "is_teacher" value to new provided value
+            is_admin = str(request.json.get("is_admin", user.is_admin)) in ["True"]
+            # Reads the new "is_teacher" value
             # If no value is provided, "is_teacher" value remains as it was
-            user.is_teacher = str(request.json.get("is_teacher", user.is_teacher)) in [
+            is_teacher = str(request.json.get("is_teacher", user.is_teacher)) in [
                 "True"
             ]
+            # If either role changes, the user's existing tokens are invalidated
+            if is_admin != user.is_admin or is_teacher != user.is_teacher:
+                bump_role_version(user)
+            user.is_admin = is_admin
+            user.is_teacher = is_teacher
         # Commits changes to the database
         db.session.commit()
+        # Writes the committed roles through to this worker's role cache
+        cache_user_roles(user)
         # Checks if user is not admin
         # Removes "is_admin" or "is_teacher" from list of updates if user isn't admin
         if user_type != "Admin":
@@ -288,10 +483,30 @@ def delete_user(id):
     user = db.get_or_404(User, id)
     # Checks if the user is an admin or returns a 403
     if user_type == "Admin":
+        # Users whose children have signed in are kept, as deleting them would delete the children
+        stmt = db.select(AttendanceEvent.event_id).where(
+            AttendanceEvent.child_id.in_(db.select(Child.id).where(Child.user_id == id))
+        )
+        if db.session.scalar(stmt.limit(1)) is not None:
+            return {
+                "Error": "This user's children have attendance history and cannot be deleted"
+            }, 400
+        # Deleting the user also deletes the attendances of their children and contacts, so today's summaries of those groups are recounted
+        stmt = db.select(Attendance.group_id).where(
+            Attendance.child_id.in_(db.select(Child.id).where(Child.user_id == id))
+            | Attendance.contact_id.in_(
+                db.select(Contact.id).where(Contact.user_id == id)
+            )
+        )
+        group_ids = db.session.scalars(stmt).all()
         # Stages deleting the returned user
         db.session.delete(user)
+        db.session.flush()
+        refresh_enrolment(group_ids)
         # The deletion is committed to the database
         db.session.commit()
+        # Marks the user as deleted in the role cache so their existing tokens are rejected
+        cache_deleted_user(id)
         return {"Success": "User registration deleted"}, 200
     # If the user is not authorised, an error message is returned
     else:
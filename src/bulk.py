@@ -0,0 +1,73 @@
+"""
+    Request parsing, per-item validation and responses for bulk create endpoints
+"""
+
+from flask import request
+from marshmallow.exceptions import ValidationError
+from init import app, db
+
+
+def bulk_items(limit="BULK_MAX_ITEMS"):
+    """Returns the list of records in the request body.
+    A body that is not a list of between 1 and the number of records set by the limit setting,
+    "BULK_MAX_ITEMS" unless another is named, raises a ValidationError, returned as a 400 error.
+    """
+    items = request.json
+    maximum = app.config[limit]
+    if not isinstance(items, list) or not 1 <= len(items) <= maximum:
+        raise ValidationError(
+            {"items": [f"Must be a list of between 1 and {maximum} records"]}
+        )
+    return items
+
+
+def load_items(schema, items, required):
+    """Loads each item with schema in one pass.
+    Returns (loaded, errors): loaded maps the index of each valid item to its loaded values and errors
+    maps the index of each invalid item to its messages, in the same form as a single item's 400 error.
+    Items missing any field named in required are invalid.
+    """
+    loaded, errors = {}, {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index] = {"_schema": ["Invalid input type."]}
+            continue
+        missing = {
+            field: ["Missing data for required field."]
+            for field in required
+            if field not in item
+        }
+        try:
+            values = schema.load(item)
+        except ValidationError as err:
+            errors[index] = {**missing, **err.messages}
+            continue
+        if missing:
+            errors[index] = missing
+        else:
+            loaded[index] = values
+    return loaded, errors
+
+
+def existing_ids(column, values):
+    """Returns the set of values that exist in column, e.g. submitted "user_id" values in User.id, in one query.
+    Values that are not whole numbers are left out, so they never match. Booleans are left out too, as True and
+    False would otherwise match ids 1 and 0.
+    """
+    ids = {value for value in values if type(value) is int}
+    if not ids:
+        return set()
+    return set(db.session.scalars(db.select(column).where(column.in_(ids))))
+
+
+def bulk_response(created, errors):
+    """Returns the body and status of a bulk endpoint.
+    created lists the dumped records in request order, each with the "index" of its item.
+    The status is 201 if every item was created, 207 if some were and 400 if none were.
+    """
+    body = {"Success": created}
+    if errors:
+        body["Errors"] = dict(sorted(errors.items()))
+    if not errors:
+        return body, 201
+    return body, 207 if created else 400
@@ -0,0 +1,130 @@
+"""
+    Compresses responses with zstd, brotli or gzip as negotiated by the request's "Accept-Encoding" header
+"""
+
+import zlib
+from functools import lru_cache
+from flask import request
+from init import app
+from formats import JSON, MSGPACK, CBOR
+
+# brotli and zstd are only offered when their packages in requirements.txt are installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Response types worth compressing
+COMPRESSIBLE_TYPES = frozenset([JSON, MSGPACK, CBOR])
+
+# Levels used for encodings missing from "COMPRESSION_LEVELS"
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        # Each chunk is flushed so streamed batches reach the client as they are sent
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+# Supported encodings in order of preference when the client accepts several equally
+_ENCODERS = {"zstd": _Zstd, "br": _Brotli, "gzip": _Gzip}
+if zstandard is None:
+    del _ENCODERS["zstd"]
+if brotli is None:
+    del _ENCODERS["br"]
+
+
+@lru_cache(maxsize=4)
+def parse_levels(value):
+    """Parses "encoding=level" pairs separated by commas into a dict of int levels."""
+    levels = dict(DEFAULT_LEVELS)
+    for pair in value.split(","):
+        if pair.strip():
+            name, level = pair.split("=")
+            levels[name.strip()] = int(level)
+    return levels
+
+
+def _compress_stream(chunks, compressor):
+    # Compresses each chunk of a streamed body as it is produced
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        # Closing the original iterable ends its request context if the client disconnects
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def compress(response):
+    """Registered as an "after_request" hook.
+    Compresses JSON, MessagePack and CBOR responses of at least "COMPRESSION_MIN_SIZE" bytes with the encoding the client
+    prefers. Streamed responses are compressed chunk by chunk, whatever their size.
+    """
+    if (
+        not app.config["COMPRESSION_ENABLED"]
+        or response.mimetype not in COMPRESSIBLE_TYPES
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    # Caches must keep a separate copy of the response for each encoding
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(list(_ENCODERS))
+    if encoding is None or request.method == "HEAD":
+        return response
+    level = parse_levels(app.config["COMPRESSION_LEVELS"])[encoding]
+    compressor = _ENCODERS[encoding](level)
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, compressor)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < app.config["COMPRESSION_MIN_SIZE"]:
+            return response
+        response.set_data(compressor.compress(data) + compressor.finish())
+    response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,189 @@
+"""
+    Table version counters and conditional GET support using ETag and Last-Modified validators
+"""
+
+from datetime import datetime, timezone
+from random import randrange
+from functools import wraps
+from hashlib import blake2b
+from flask import current_app, request, make_response
+from flask_jwt_extended import get_jwt
+from sqlalchemy import event, func, Engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.sql.dml import Insert, Update, Delete
+from init import db
+from eager_loading import dumped_tables
+from models.table_version import TableVersion, VERSION_SHARDS
+from schemas import cached_schema
+from formats import response_type
+
+
+def _now():
+    # Naive UTC time, as stored in "table_versions"
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def bump_versions(connection, tables):
+    """Increments the version of each named table in the transaction of the given connection.
+    Each table's version is spread over "VERSION_SHARDS" rows and one, picked at random, is incremented, so
+    concurrent transactions writing to the same table rarely wait for each other's row lock.
+    """
+    now = _now()
+    insert = (
+        postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    )
+    for table in sorted(tables):
+        # Rows are seeded by migration v009, tables added later get theirs from the first write
+        stmt = insert(TableVersion).values(
+            table_name=table, shard=randrange(VERSION_SHARDS), version=1, updated=now
+        )
+        connection.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["table_name", "shard"],
+                set_={"version": TableVersion.version + 1, "updated": now},
+            )
+        )
+
+
+def _referencing_tables(table):
+    # Deleting rows can also delete or change rows in tables holding foreign keys to them
+    return {
+        other.name
+        for other in db.metadata.sorted_tables
+        if any(key.column.table is table for key in other.foreign_keys)
+    }
+
+
+@event.listens_for(Engine, "after_execute")
+def _versions_after_execute(conn, clauseelement, multiparams, params, options, result):
+    # Every insert, update and delete, from flushes or "db.session.execute", runs through here
+    # Versions are bumped inside the same transaction, so they only change if the changes are committed
+    if not isinstance(clauseelement, (Insert, Update, Delete)):
+        return
+    table = clauseelement.table
+    tables = {table.name}
+    if isinstance(clauseelement, Delete):
+        tables.update(_referencing_tables(table))
+    # Each table is bumped once per transaction
+    bumped = conn.info.setdefault("bumped_tables", set())
+    tables.difference_update(bumped)
+    # Only model tables are versioned, not "table_versions" itself or "schema_migrations"
+    tables.intersection_update(db.metadata.tables)
+    tables.discard(TableVersion.__tablename__)
+    if tables:
+        bumped.update(tables)
+        bump_versions(conn, tables)
+
+
+@event.listens_for(Engine, "commit")
+@event.listens_for(Engine, "rollback")
+def _versions_end_transaction(conn):
+    conn.info.pop("bumped_tables", None)
+
+
+def validators(tables):
+    """Returns (etag, last_modified) for the current request reading rows from the named tables.
+    The ETag covers the request URL and response type, the requesting user and their role version, and the tables'
+    versions, so it changes whenever the response could.
+    """
+    # Each transaction adds 1 to one of a table's rows, so the sum changes with every committed write
+    rows = db.session.execute(
+        db.select(
+            TableVersion.table_name,
+            func.sum(TableVersion.version),
+            func.max(TableVersion.updated),
+        )
+        .where(TableVersion.table_name.in_(sorted(tables)))
+        .group_by(TableVersion.table_name)
+        .order_by(TableVersion.table_name)
+    ).all()
+    claims = get_jwt()
+    key = "|".join(
+        [
+            request.full_path,
+            response_type(),
+            str(claims.get("sub")),
+            str(claims.get("role_version")),
+        ]
+        + [f"{name}={version}" for name, version, _ in rows]
+    )
+    etag = blake2b(key.encode(), digest_size=16, key=_etag_key()).hexdigest()
+    modified = max((updated for _, _, updated in rows if updated), default=None)
+    if modified is not None:
+        modified = modified.replace(tzinfo=timezone.utc, microsecond=0)
+    return etag, modified
+
+
+def _etag_key():
+    # ETags are keyed with the app's secret, so only a client that received one can send it back
+    return blake2b(
+        current_app.config["JWT_SECRET_KEY"].encode(), digest_size=32
+    ).digest()
+
+
+def _etag_matches(etag):
+    # "If-None-Match: *" would match any response, including one the user may not see
+    if_none_match = request.if_none_match
+    return not if_none_match.star_tag and if_none_match.contains_weak(etag)
+
+
+def _modified_since(modified):
+    since = request.if_modified_since
+    return since is not None and modified is not None and modified <= since
+
+
+def conditional(model, schema_class, **options):
+    """Decorates a GET endpoint returning model rows dumped with schema_class(**options).
+    Successful responses carry a weak ETag and a Last-Modified header. Requests whose "If-None-Match" header
+    still matches are answered with 304 Not Modified without running the endpoint. Requests relying on
+    "If-Modified-Since" get a 304 only after the endpoint returned a 200. Must be placed below "@jwt_required()".
+    Example: @conditional(Child, ChildSchema, only=["user_id", "first_name", "comments"])
+    """
+    return _conditional(
+        lambda: dumped_tables(model, cached_schema(schema_class, **options))
+    )
+
+
+def conditional_on(*models):
+    """Like conditional, for a GET endpoint that builds its response from the rows of models without a schema.
+    Example: @conditional_on(Group, Attendance, Child, Contact, User)
+    """
+    tables = frozenset(model.__tablename__ for model in models)
+    return _conditional(lambda: tables)
+
+
+def _conditional(read_tables):
+    # read_tables returns the names of the tables the endpoint's response is read from
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag, modified = validators(read_tables())
+            # The ETag covers the user, their role and the data, so a matching one proves they were sent this
+            # response with a 200 and the endpoint's permission checks would pass again
+            if request.if_none_match and _etag_matches(etag):
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                # "If-Modified-Since" is only used when the client sends no "If-None-Match"
+                # Any client can send a date, so it is only compared once the endpoint has allowed the request
+                if not request.if_none_match and _modified_since(modified):
+                    response = make_response("", 304)
+            response.set_etag(etag, weak=True)
+            if modified is not None:
+                response.last_modified = modified
+            # Responses depend on the user, so they may only be stored by the user's own client
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            # A 304 carries the same "Vary" as the 200 it stands for, in the same order
+            response.vary.add("Accept")
+            response.vary.add("Authorization")
+            # The compression hook skips 304s, but adds "Accept-Encoding" to every 200 it could compress
+            if current_app.config["COMPRESSION_ENABLED"]:
+                response.vary.add("Accept-Encoding")
+            return response
+
+        return wrapper
+
+    return decorator
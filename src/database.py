@@ -0,0 +1,139 @@
+"""
+    Connection pool options and routing of GET requests' reads to an optional read replica
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from math import ceil
+from time import time
+from flask import current_app, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from itsdangerous import BadSignature, URLSafeSerializer
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, Engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+
+# Bind key of the read replica in "SQLALCHEMY_BINDS"
+REPLICA = "replica"
+
+# Requests whose reads may be answered by the replica
+READ_METHODS = frozenset(["GET", "HEAD"])
+
+# Cookie holding the signed user id and time until which a client that wrote reads from the primary
+# Kept by the client, so every worker process routes its next requests the same way
+STICKY_COOKIE = "read_primary"
+
+
+def engine_options(uri, pool_size, max_overflow, pre_ping, recycle):
+    """Returns the SQLAlchemy engine options for the database at uri.
+    In-memory SQLite databases share a single connection, so no pool size is set for them.
+    """
+    options = {"pool_pre_ping": pre_ping, "pool_recycle": recycle}
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+    options["pool_size"] = pool_size
+    options["max_overflow"] = max_overflow
+    return options
+
+
+def _identity():
+    # The user of the request's verified JWT, or None if there is not one
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+def _signer():
+    return URLSafeSerializer(current_app.config["JWT_SECRET_KEY"], salt=STICKY_COOKIE)
+
+
+def _recently_wrote(user_id):
+    # The cookie is only trusted for the user it was signed for, until its deadline
+    token = request.cookies.get(STICKY_COOKIE)
+    if token is None:
+        return False
+    try:
+        writer, deadline = _signer().loads(token)
+    except (BadSignature, TypeError, ValueError):
+        return False
+    return writer == user_id and deadline > time()
+
+
+class RoutingSession(Session):
+    """Session sending the SELECTs of GET requests to the "replica" bind when one is configured.
+    Everything else uses the primary database, including every statement after the session
+    writes, the reads of a user who wrote in the last "REPLICA_STICKY_SECONDS" and anything
+    run inside on_primary().
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            return self._db.engines[REPLICA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if isinstance(clause, UpdateBase):
+            # INSERT, UPDATE or DELETE statements pin the rest of the request to the primary
+            self.info["wrote"] = True
+            return False
+        # Anything else that is not a SELECT, e.g. get_bind() called without a statement, uses the primary
+        return (
+            getattr(clause, "is_select", False)
+            and not self.info.get("wrote")
+            and not self.info.get("primary")
+            and has_request_context()
+            and request.method in READ_METHODS
+            and REPLICA in self._db.engines
+            and not _recently_wrote(_identity())
+        )
+
+
+@event.listens_for(Engine, "connect")
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    # SQLite only enforces foreign keys and their "ON DELETE" actions on connections that turn them on,
+    # so they behave as they do on PostgreSQL
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys = ON")
+        cursor.close()
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _flushing(session, flush_context, instances):
+    # Flushes get their connection without a statement, so they pin the rest of the request to the primary here
+    session.info["wrote"] = True
+
+
+@contextmanager
+def on_primary(session):
+    """Runs the statements inside the block on the primary database, e.g. reads that must never be stale."""
+    session.info["primary"] = session.info.get("primary", 0) + 1
+    try:
+        yield
+    finally:
+        session.info["primary"] -= 1
+
+
+def remember_writes(response):
+    """Registered as an "after_request" hook.
+    Sends the reads of a user whose request wrote to the primary database for the next
+    "REPLICA_STICKY_SECONDS", so they see their own changes while the replica catches up.
+    The deadline is set in a signed cookie, which any worker process can check.
+    """
+    extension = current_app.extensions["sqlalchemy"]
+    if not extension.session.info.get("wrote") or REPLICA not in extension.engines:
+        return response
+    user_id = _identity()
+    if user_id is not None:
+        seconds = current_app.config["REPLICA_STICKY_SECONDS"]
+        response.set_cookie(
+            STICKY_COOKIE,
+            _signer().dumps([user_id, time() + seconds]),
+            max_age=ceil(seconds),
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
@@ -0,0 +1,106 @@
+"""
+    Builds SQLAlchemy eager loading options from the nested fields of marshmallow schemas
+"""
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import selectinload, joinedload, load_only
+from marshmallow import fields
+
+# Stops planning if nested schemas ever refer back to each other without an "only" or "exclude"
+MAX_DEPTH = 5
+
+# Stores built options by model, schema class and the schema's "only" and "exclude" values
+_plans = {}
+_columns = {}
+_tables = {}
+
+
+def _nested_schema(field):
+    # Returns the schema dumped by a Nested or List(Nested) field, or None for other fields
+    if isinstance(field, fields.List):
+        field = field.inner
+    if isinstance(field, fields.Nested):
+        return field.schema
+    return None
+
+
+def _plan(model, schema, depth):
+    relationships = inspect(model).relationships
+    options = []
+    for name, field in schema.dump_fields.items():
+        attribute = field.attribute or name
+        nested = _nested_schema(field)
+        if nested is None or attribute not in relationships or depth == 0:
+            continue
+        relationship = relationships[attribute]
+        # Collections are loaded with one extra "IN" query per relationship
+        # Single related rows are joined onto the parent query
+        loader = selectinload if relationship.uselist else joinedload
+        option = loader(getattr(model, attribute))
+        nested_options = _plan(relationship.mapper.class_, nested, depth - 1)
+        if nested_options:
+            option = option.options(*nested_options)
+        options.append(option)
+    return options
+
+
+def _plan_key(model, schema):
+    return (
+        model,
+        type(schema),
+        frozenset(schema.only) if schema.only else None,
+        frozenset(schema.exclude),
+    )
+
+
+def eager_load(model, schema):
+    """Returns loader options for a "db.select(model)" statement that load every relationship
+    the schema instance will dump, so dumping the results triggers no lazy loads.
+    Example: db.select(Child).options(*eager_load(Child, ChildSchema(many=True)))
+    """
+    key = _plan_key(model, schema)
+    if key not in _plans:
+        _plans[key] = _plan(model, schema, MAX_DEPTH)
+    return _plans[key]
+
+
+def load_columns(model, schema):
+    """Returns a "load_only" option selecting just the model's columns the schema instance dumps.
+    Primary keys and the foreign keys of dumped relationships are always selected.
+    Example: db.select(Child).options(*load_columns(Child, ChildSchema(only=["id", "first_name"])))
+    """
+    key = _plan_key(model, schema)
+    if key not in _columns:
+        mapper = inspect(model)
+        columns = list(mapper.primary_key)
+        for name, field in schema.dump_fields.items():
+            attribute = field.attribute or name
+            if attribute in mapper.column_attrs:
+                columns += mapper.column_attrs[attribute].columns
+            elif attribute in mapper.relationships:
+                columns += mapper.relationships[attribute].local_columns
+        names = dict.fromkeys(mapper.get_property_by_column(c).key for c in columns)
+        _columns[key] = [load_only(*(getattr(model, name) for name in names))]
+    return _columns[key]
+
+
+def _walk_tables(model, schema, depth, tables):
+    tables.add(model.__table__.name)
+    relationships = inspect(model).relationships
+    for name, field in schema.dump_fields.items():
+        attribute = field.attribute or name
+        nested = _nested_schema(field)
+        if nested is None or attribute not in relationships or depth == 0:
+            continue
+        _walk_tables(relationships[attribute].mapper.class_, nested, depth - 1, tables)
+    return tables
+
+
+def dumped_tables(model, schema):
+    """Returns the names of every table the schema instance reads rows from when dumping the model.
+    Example: dumped_tables(Group, GroupSchema()) returns {"groups", "teachers", "attendances", ...}
+    """
+    key = _plan_key(model, schema)
+    if key not in _tables:
+        _tables[key] = frozenset(_walk_tables(model, schema, MAX_DEPTH, set()))
+    return _tables[key]
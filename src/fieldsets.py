@@ -0,0 +1,28 @@
+"""
+    Narrows collection schemas to the fields a client names in "?fields="
+"""
+
+from flask import request
+from marshmallow.exceptions import ValidationError
+from schemas import cached_schema
+
+
+def sparse_schema(schema_class, **options):
+    """Returns cached_schema(schema_class, **options) limited to the comma separated fields in "?fields=".
+    Without the parameter the schema is returned unchanged. Names the schema does not dump raise a
+    ValidationError, returned to the user as a 400 error.
+    Example: "GET /children?fields=id,first_name" dumps each child's "id" and "first_name" only
+    """
+    schema = cached_schema(schema_class, **options)
+    value = request.args.get("fields")
+    if value is None:
+        return schema
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = sorted(names.difference(schema.dump_fields))
+    if unknown or not names:
+        raise ValidationError(
+            {"fields": [f"Must be one or more of: {', '.join(schema.dump_fields)}"]}
+        )
+    # Fields keep the schema's order so each set of names maps to one cached schema
+    only = [name for name in schema.dump_fields if name in names]
+    return cached_schema(schema_class, **{**options, "only": only})
@@ -0,0 +1,83 @@
+"""
+    MessagePack and CBOR alternatives to JSON for request and response bodies
+"""
+
+import msgpack
+from flask import Request, current_app, has_request_context, request
+
+# CBOR is only offered when the cbor2 package in requirements.txt is installed
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Response types in order of preference, JSON is returned unless the client prefers another
+RESPONSE_TYPES = [JSON, MSGPACK] + ([CBOR] if cbor2 is not None else [])
+BINARY_TYPES = frozenset(RESPONSE_TYPES[1:])
+
+
+def response_type():
+    """Returns the response type negotiated by the request's "Accept" header, JSON by default."""
+    if not has_request_context():
+        return JSON
+    return request.accept_mimetypes.best_match(RESPONSE_TYPES, JSON)
+
+
+def _cbor_default(encoder, value):
+    encoder.encode(current_app.json.default(value))
+
+
+def encode(obj, mimetype):
+    """Returns obj encoded as a binary response type.
+    Values neither format supports are converted the same way as in JSON responses, e.g. dates to strings.
+    """
+    if mimetype == MSGPACK:
+        return msgpack.packb(obj, default=current_app.json.default)
+    return cbor2.dumps(obj, default=_cbor_default)
+
+
+def collection_parts(mimetype):
+    """Returns (start, separator, end) bytes written around the encoded items of a streamed
+    CBOR array. MessagePack arrays begin with their length, so they cannot be streamed and
+    None is returned.
+    """
+    if mimetype == CBOR:
+        # Indefinite length array
+        return b"\x9f", b"", b"\xff"
+    return None
+
+
+def array_header(length):
+    """Returns the MessagePack header of an array with the given number of items."""
+    return msgpack.Packer().pack_array_header(length)
+
+
+class ApiRequest(Request):
+    """Request class reading MessagePack and CBOR bodies through "request.json" like JSON bodies."""
+
+    def get_json(self, force=False, silent=False, cache=True):
+        if self.mimetype not in BINARY_TYPES:
+            return super().get_json(force=force, silent=silent, cache=cache)
+        if cache and self._cached_json[silent] is not Ellipsis:
+            return self._cached_json[silent]
+        data = self.get_data(cache=cache)
+        try:
+            if self.mimetype == MSGPACK:
+                rv = msgpack.unpackb(data)
+            else:
+                rv = cbor2.loads(data)
+        except ValueError as e:
+            if not silent:
+                return self.on_json_loading_failed(e)
+            rv = None
+            if cache:
+                self._cached_json = (self._cached_json[0], rv)
+        else:
+            if cache:
+                self._cached_json = (rv, rv)
+        return rv
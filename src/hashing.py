@@ -0,0 +1,75 @@
+"""
+    Runs bcrypt password hashing on a bounded pool of worker threads
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+from init import app, bcrypt
+
+
+class HashingBusy(Exception):
+    """Raised when no hashing worker frees up within "BCRYPT_QUEUE_TIMEOUT" seconds."""
+
+
+# bcrypt releases the GIL while hashing, so threads can run hashes in parallel
+# The semaphore caps how many hashes run at once across all request threads of this worker
+_executor = ThreadPoolExecutor(
+    max_workers=app.config["BCRYPT_WORKERS"], thread_name_prefix="bcrypt"
+)
+_slots = BoundedSemaphore(app.config["BCRYPT_WORKERS"])
+
+
+def _run(func, *args):
+    # Waits for a free hashing slot or raises HashingBusy
+    if not _slots.acquire(timeout=app.config["BCRYPT_QUEUE_TIMEOUT"]):
+        raise HashingBusy()
+    try:
+        return _executor.submit(func, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    """Returns a utf-8 bcrypt hash of password using the configured "BCRYPT_LOG_ROUNDS" cost."""
+    return _run(bcrypt.generate_password_hash, password).decode("utf-8")
+
+
+def hash_passwords(passwords):
+    """Returns utf-8 bcrypt hashes of a list of passwords, hashed in parallel by the hashing workers.
+    At most one less than "BCRYPT_WORKERS" hashes run at once, so a slot stays free for other requests,
+    e.g. logins. Each hash waits for a free slot like hash_password does. If one fails or no slot frees up,
+    the hashes not yet started are cancelled before the error is raised.
+    """
+    share = max(1, app.config["BCRYPT_WORKERS"] - 1)
+    futures = []
+    try:
+        for index, password in enumerate(passwords):
+            # Waits for this request's oldest running hash once it has used its share of the slots
+            if index >= share:
+                futures[index - share].result()
+            if not _slots.acquire(timeout=app.config["BCRYPT_QUEUE_TIMEOUT"]):
+                raise HashingBusy()
+            future = _executor.submit(bcrypt.generate_password_hash, password)
+            # Cancelled hashes also run their callback, so their slot is released
+            future.add_done_callback(lambda _: _slots.release())
+            futures.append(future)
+        return [future.result().decode("utf-8") for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+def check_password(pw_hash, password):
+    """Returns True if password matches the stored bcrypt hash."""
+    return _run(bcrypt.check_password_hash, pw_hash, password)
+
+
+def hash_cost(pw_hash):
+    """Returns the cost factor recorded in a bcrypt hash, e.g. 12 for "$2b$12$..."."""
+    return int(pw_hash.split("$")[2])
+
+
+def needs_rehash(pw_hash):
+    """Returns True if a stored hash was made with a different cost than is configured."""
+    return hash_cost(pw_hash) != app.config["BCRYPT_LOG_ROUNDS"]
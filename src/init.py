@@ -1,22 +1,99 @@
-from os import environ
+from os import environ, path
+from tempfile import gettempdir
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from flask_marshmallow import Marshmallow
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
+from json_provider import OrjsonProvider
+from formats import ApiRequest
+from database import RoutingSession, REPLICA, engine_options
 
 
 app = Flask(__name__)
+# Reads MessagePack and CBOR request bodies through "request.json"
+app.request_class = ApiRequest
+# Serialises responses with orjson, producing the same bytes as Flask's default provider
+app.json = OrjsonProvider(app)
+# Optional settings left blank, e.g. in a copy of ".env.sample", use their defaults
 app.config["JWT_SECRET_KEY"] = environ.get("JWT_KEY")
 app.config["SQLALCHEMY_DATABASE_URI"] = environ.get("DB_URI")
+# Connections each worker keeps open, extra connections it may open under load, whether connections
+# are tested before use and seconds after which they are replaced
+app.config["DB_POOL_SIZE"] = int(environ.get("DB_POOL_SIZE") or 5)
+app.config["DB_MAX_OVERFLOW"] = int(environ.get("DB_MAX_OVERFLOW") or 10)
+app.config["DB_POOL_PRE_PING"] = (environ.get("DB_POOL_PRE_PING") or "True").capitalize() in ["True"]
+app.config["DB_POOL_RECYCLE"] = int(environ.get("DB_POOL_RECYCLE") or 1800)
+# Optional read replica answering the reads of GET requests, and seconds a user's reads stay on the primary after they write
+app.config["DB_REPLICA_URI"] = environ.get("DB_REPLICA_URI")
+app.config["REPLICA_STICKY_SECONDS"] = float(environ.get("REPLICA_STICKY_SECONDS") or 5)
+# Maximum number of users and seconds per entry held in each worker's role cache
+# A role change or deletion only clears the cache of the worker that made it, so other workers may accept
+# the user's old tokens for up to "ROLE_CACHE_TTL" seconds
+app.config["ROLE_CACHE_SIZE"] = int(environ.get("ROLE_CACHE_SIZE") or 1024)
+app.config["ROLE_CACHE_TTL"] = int(environ.get("ROLE_CACHE_TTL") or 5)
+# Days a refresh token can be used to obtain new access tokens without logging in
+app.config["REFRESH_TOKEN_DAYS"] = int(environ.get("REFRESH_TOKEN_DAYS") or 30)
+# Token bucket limits as "name=requests/seconds" pairs, named by endpoint, blueprint or "default"
+app.config["RATE_LIMIT_ENABLED"] = (environ.get("RATE_LIMIT_ENABLED") or "True").capitalize() in ["True"]
+app.config["RATE_LIMITS"] = (
+    environ.get("RATE_LIMITS") or "default=120/60,user.login=10/60,user.refresh=30/60"
+)
+# File holding the buckets, shared by every worker process that points at it
+app.config["RATE_LIMIT_STORE"] = environ.get("RATE_LIMIT_STORE") or path.join(
+    gettempdir(), "classtracker-ratelimit.sqlite3"
+)
+# Rows loaded per batch when streaming collection endpoints
+app.config["STREAM_BATCH_SIZE"] = int(environ.get("STREAM_BATCH_SIZE") or 500)
+# Rows per page when a collection is requested without "?limit=", 0 returns the whole collection
+app.config["DEFAULT_PAGE_SIZE"] = int(environ.get("DEFAULT_PAGE_SIZE") or 0)
+# Largest "?limit=" a client may request
+app.config["MAX_PAGE_SIZE"] = int(environ.get("MAX_PAGE_SIZE") or 1000)
+# Compresses JSON responses for clients sending "Accept-Encoding", levels given as "encoding=level" pairs
+# Responses smaller than the minimum size in bytes are sent uncompressed, streamed responses are always compressed
+app.config["COMPRESSION_ENABLED"] = (environ.get("COMPRESSION_ENABLED") or "True").capitalize() in ["True"]
+app.config["COMPRESSION_LEVELS"] = environ.get("COMPRESSION_LEVELS") or "zstd=3,br=4,gzip=6"
+app.config["COMPRESSION_MIN_SIZE"] = int(environ.get("COMPRESSION_MIN_SIZE") or 1024)
+# Times one statement may run in a request before debug mode logs it as a likely N+1 query
+app.config["SQL_REPEAT_WARNING"] = int(environ.get("SQL_REPEAT_WARNING") or 3)
+# Most records one request to a bulk endpoint may create, and rows sent in each batched insert
+app.config["BULK_MAX_ITEMS"] = int(environ.get("BULK_MAX_ITEMS") or 5000)
+app.config["BULK_BATCH_SIZE"] = int(environ.get("BULK_BATCH_SIZE") or 500)
+# Most users one bulk request may create, kept small as every password is bcrypt hashed
+app.config["BULK_MAX_USERS"] = int(environ.get("BULK_MAX_USERS") or 50)
+# Local time after which a child's first sign in of the day counts as late in attendance summaries
+app.config["LATE_AFTER"] = environ.get("LATE_AFTER") or "09:00"
+# bcrypt cost factor for new password hashes, stored hashes with a different cost are rehashed on login
+app.config["BCRYPT_LOG_ROUNDS"] = int(environ.get("BCRYPT_LOG_ROUNDS") or 12)
+# Maximum concurrent bcrypt hashes per worker and seconds a request waits for a free slot
+app.config["BCRYPT_WORKERS"] = int(environ.get("BCRYPT_WORKERS") or 2)
+app.config["BCRYPT_QUEUE_TIMEOUT"] = float(environ.get("BCRYPT_QUEUE_TIMEOUT") or 5)
 app.json.sort_keys=False
 
+def _pool_options(uri):
+    return engine_options(
+        uri,
+        app.config["DB_POOL_SIZE"],
+        app.config["DB_MAX_OVERFLOW"],
+        app.config["DB_POOL_PRE_PING"],
+        app.config["DB_POOL_RECYCLE"],
+    )
+
+
+if app.config["SQLALCHEMY_DATABASE_URI"]:
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = _pool_options(app.config["SQLALCHEMY_DATABASE_URI"])
+if app.config["DB_REPLICA_URI"]:
+    app.config["SQLALCHEMY_BINDS"] = {
+        REPLICA: {"url": app.config["DB_REPLICA_URI"], **_pool_options(app.config["DB_REPLICA_URI"])}
+    }
+
 class Base(DeclarativeBase):
     pass
 
 
-db = SQLAlchemy(model_class=Base)
+# Sends the reads of GET requests to the replica when "DB_REPLICA_URI" is set
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 db.init_app(app)
 ma = Marshmallow(app)
 bcrypt = Bcrypt(app)
@@ -0,0 +1,45 @@
+"""
+    Single statement and batched inserts that skip rows which would duplicate a unique index
+"""
+
+from sqlalchemy.dialects import postgresql, sqlite
+from init import app, db
+
+
+def dialect_insert(model):
+    """Returns an INSERT for model supporting the connected database's "ON CONFLICT" clauses."""
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    return insert(model)
+
+
+def insert_new(model, conflict_columns, **values):
+    """Inserts a row with "INSERT ... ON CONFLICT DO NOTHING ... RETURNING" in the current transaction.
+    Returns the new row as a model object built from RETURNING, or None if a row with the same
+    conflict_columns values already exists. conflict_columns must match a unique index of the table.
+    Example: insert_new(Group, ["group_name", "day"], group_name="Koalas", day="Friday", teacher_id=1)
+    """
+    stmt = (
+        dialect_insert(model)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=conflict_columns)
+        .returning(model)
+    )
+    return db.session.scalar(stmt)
+
+
+def insert_many(model, rows, returning, conflict_columns=None):
+    """Inserts a list of row dicts in executemany batches of "BULK_BATCH_SIZE" rows in the current transaction.
+    Returns the returning columns of every inserted row, in no particular order, so they should include
+    a key identifying each row. With conflict_columns, rows that would duplicate a unique index are skipped.
+    Example: insert_many(Child, rows, [Child.id, Child.user_id, Child.first_name, Child.last_name])
+    """
+    stmt = dialect_insert(model)
+    if conflict_columns:
+        stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+    stmt = stmt.returning(*returning)
+    size = app.config["BULK_BATCH_SIZE"]
+    inserted = []
+    for start in range(0, len(rows), size):
+        inserted.extend(db.session.execute(stmt, rows[start : start + size]).all())
+    return inserted
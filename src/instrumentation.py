@@ -0,0 +1,187 @@
+"""
+    Per-request SQL statistics: query count, database time and repeated statement shapes
+"""
+
+import re
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+from urllib.parse import urlsplit
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event, Engine
+from werkzeug.routing import RequestRedirect
+
+# Runs of bound parameters, e.g. the values of an "IN" list, are collapsed so their length does not change a shape
+_PARAMETER_LISTS = re.compile(
+    r"\(\s*(?:\?|%s|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|%\(\w+\)s))+\s*\)"
+)
+_WHITESPACE = re.compile(r"\s+")
+
+# Statistics collected by count_queries() blocks that are running, in or outside requests
+_captures = []
+
+
+def statement_shape(statement):
+    """Returns a statement with its whitespace and parameter lists normalised, so repeated queries compare equal."""
+    return _PARAMETER_LISTS.sub("(...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryStats:
+    """Number of statements executed, total seconds spent executing them and how often each shape ran.
+    Shapes are only recorded in debug mode and by count_queries(), the only places they are read.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, duration, shape=None):
+        self.count += 1
+        self.duration += duration
+        if shape is not None:
+            self.shapes[shape] += 1
+
+    def repeated(self):
+        """Returns the statement shapes run more than once, mapped to how often they ran, most frequent first."""
+        return {shape: n for shape, n in self.shapes.most_common() if n > 1}
+
+    def summary(self):
+        return f"queries={self.count}; time_ms={self.duration * 1000:.2f}; repeated={len(self.repeated())}"
+
+
+def request_stats():
+    """Returns the statistics of the current request, created on first use."""
+    if "sql_stats" not in g:
+        g.sql_stats = QueryStats()
+    return g.sql_stats
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = perf_counter() - conn.info["query_start"].pop()
+    in_request = has_request_context()
+    debug = in_request and current_app.debug
+    # Production requests only count and time statements, normalising them costs a regex pass each
+    shape = statement_shape(statement) if debug or _captures else None
+    if in_request:
+        request_stats().record(duration, shape if debug else None)
+    for stats in _captures:
+        stats.record(duration, shape)
+
+
+@event.listens_for(Engine, "handle_error")
+def _query_failed(exception_context):
+    # A failed statement never reaches "after_cursor_execute"
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+
+def query_budget(limit):
+    """Declares the most SQL statements one request to the decorated endpoint should need.
+    Debug mode logs requests that exceed it and assert_query_budget() fails on them.
+    Example: @query_budget(4)
+    """
+
+    def decorator(view):
+        view.query_budget = limit
+        return view
+
+    return decorator
+
+
+def sql_stats_header(response):
+    """Registered as an "after_request" hook.
+    In debug mode the request's statistics so far are sent in the "X-SQL-Stats" header and as a
+    "Server-Timing" entry. Statements run while a response streams are only included in the log.
+    """
+    if current_app.debug:
+        stats = request_stats()
+        response.headers["X-SQL-Stats"] = stats.summary()
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"',
+        )
+    return response
+
+
+def log_sql_stats(exception=None):
+    """Registered as a "teardown_request" hook, which runs after a streamed response ends.
+    In debug mode repeated statement shapes, the usual sign of lazy loads inside a loop, and
+    requests exceeding their endpoint's query budget are logged as warnings.
+    """
+    if not current_app.debug or "sql_stats" not in g:
+        return
+    stats = g.sql_stats
+    budget = _endpoint_budget(request.endpoint)
+    if budget is not None and stats.count > budget:
+        current_app.logger.warning(
+            "%s %s ran %d queries, its budget is %d",
+            request.method,
+            request.path,
+            stats.count,
+            budget,
+        )
+    for shape, n in stats.repeated().items():
+        if n >= current_app.config["SQL_REPEAT_WARNING"]:
+            current_app.logger.warning(
+                "%s %s ran the same query %d times: %s",
+                request.method,
+                request.path,
+                n,
+                shape,
+            )
+
+
+def _endpoint_budget(endpoint):
+    view = current_app.view_functions.get(endpoint)
+    return getattr(view, "query_budget", None)
+
+
+@contextmanager
+def count_queries():
+    """Collects the statistics of every statement run inside the block."""
+    stats = QueryStats()
+    _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        _captures.remove(stats)
+
+
+def assert_query_budget(client, path, method="GET", **kwargs):
+    """Test helper sending a request with a Flask test client and returning its response.
+    Raises AssertionError, listing the repeated statements, if the request ran more queries
+    than the budget its endpoint declares with @query_budget.
+    Paths missing a trailing slash, e.g. "/children", are sent to the URL Flask would redirect them to.
+    Example: assert_query_budget(client, "/children/1/attendances", headers=auth)
+    """
+    app = client.application
+    adapter = app.url_map.bind("localhost")
+    route, _, query = path.partition("?")
+    try:
+        endpoint, _ = adapter.match(route, method)
+    except RequestRedirect as redirect:
+        route = urlsplit(redirect.new_url).path
+        endpoint, _ = adapter.match(route, method)
+    with count_queries() as stats:
+        response = client.open(
+            f"{route}?{query}" if query else route, method=method, **kwargs
+        )
+        # Streamed bodies run their queries as they are read
+        response.get_data()
+    budget = getattr(app.view_functions.get(endpoint), "query_budget", None)
+    if budget is not None and stats.count > budget:
+        repeated = "".join(
+            f"\n  {n} x {shape}" for shape, n in stats.repeated().items()
+        )
+        raise AssertionError(
+            f"{method} {path} ran {stats.count} queries, its budget is {budget}{repeated}"
+        )
+    return response
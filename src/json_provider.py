@@ -0,0 +1,67 @@
+"""
+    orjson-backed replacement for Flask's default JSON provider
+"""
+
+import json
+import orjson
+from flask.json.provider import DefaultJSONProvider
+from formats import JSON, response_type, encode
+
+# Dates and dataclasses are passed to Flask's "default" function so they serialise exactly as before
+OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialises compact responses with orjson and parses request bodies with orjson.
+    Requests whose "Accept" header prefers MessagePack or CBOR receive the same data in that format.
+    Responses are byte-identical to the default provider's: non-ASCII text, which Flask escapes,
+    and values orjson cannot encode fall back to the json module.
+    Floats below 1e-4 or from 1e16 up are written in orjson's exponent form ("1e16" not "1e+16"),
+    no endpoint returns such values.
+    """
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        mimetype = response_type()
+        # Clients preferring MessagePack or CBOR receive the same data in that format
+        if mimetype != JSON:
+            obj = self._prepare_response_obj(args, kwargs)
+            response = self._app.response_class(
+                encode(obj, mimetype), mimetype=mimetype
+            )
+        # Pretty printed debug responses are left to the default provider
+        elif (self.compact is None and self._app.debug) or self.compact is False:
+            response = super().response(*args, **kwargs)
+        else:
+            obj = self._prepare_response_obj(args, kwargs)
+            response = self._app.response_class(
+                self.compact_bytes(obj) + b"\n", mimetype=self.mimetype
+            )
+        response.vary.add("Accept")
+        return response
+
+    def compact_bytes(self, obj):
+        """Returns obj encoded exactly as in a compact response body, without the trailing newline."""
+        if not self.sort_keys:
+            try:
+                data = orjson.dumps(obj, default=self.default, option=OPTIONS)
+            except orjson.JSONEncodeError:
+                data = None
+            # Flask escapes non-ASCII characters by default, orjson never does
+            if data is not None and (data.isascii() or not self.ensure_ascii):
+                return data
+        return json.dumps(
+            obj,
+            default=self.default,
+            ensure_ascii=self.ensure_ascii,
+            sort_keys=self.sort_keys,
+            separators=(",", ":"),
+        ).encode("utf-8")
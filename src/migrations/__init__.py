@@ -0,0 +1,61 @@
+"""
+    Versioned, forward-only schema migrations applied with "flask cli db_migrate"
+"""
+
+import pkgutil
+from datetime import datetime, timezone
+from importlib import import_module
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, select
+
+# Records which migrations have run, kept apart from the models' metadata
+metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(200), nullable=False),
+    Column("applied", DateTime, nullable=False),
+)
+
+
+def available():
+    """Returns (version, name, module) for every migration module in this package, oldest first.
+    Modules are named "v<version>_<name>.py", e.g. "v002_foreign_key_indexes.py", and define
+    "upgrade(connection)". Applied migrations must never be edited, later changes get a new module.
+    """
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        prefix, _, name = info.name.partition("_")
+        if prefix.startswith("v") and prefix[1:].isdigit():
+            module = import_module(f"{__name__}.{info.name}")
+            migrations.append((int(prefix[1:]), name, module))
+    return sorted(migrations, key=lambda migration: migration[0])
+
+
+def applied_versions(connection):
+    """Returns the set of migration versions already applied to the connected database."""
+    metadata.create_all(connection, checkfirst=True)
+    return set(connection.scalars(select(schema_migrations.c.version)))
+
+
+def migrate(engine):
+    """Applies every pending migration in order, each in its own transaction.
+    Returns the (version, name) of each migration applied.
+    """
+    with engine.begin() as connection:
+        done = applied_versions(connection)
+    applied = []
+    for version, name, module in available():
+        if version in done:
+            continue
+        with engine.begin() as connection:
+            module.upgrade(connection)
+            connection.execute(
+                schema_migrations.insert().values(
+                    version=version,
+                    name=name,
+                    applied=datetime.now(timezone.utc).replace(tzinfo=None),
+                )
+            )
+        applied.append((version, name))
+    return applied
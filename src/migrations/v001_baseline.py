@@ -0,0 +1,87 @@
+"""
+    Creates the baseline schema, the tables "db_init" built before versioned migrations.
+Tables that already exist, e.g. in databases built by that "db_init", are left unchanged.
+"""
+
+from sqlalchemy import (
+    MetaData,
+    Table,
+    Column,
+    Integer,
+    String,
+    Text,
+    Boolean,
+    Date,
+    ForeignKey,
+)
+
+# A frozen copy of the baseline schema, later model changes belong in new migrations
+metadata = MetaData()
+
+Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("email", String(200), nullable=False),
+    Column("password", String(200)),
+    Column("first_name", String(200), nullable=False),
+    Column("is_admin", Boolean, server_default="false", nullable=False),
+    Column("is_teacher", Boolean, server_default="false", nullable=False),
+)
+Table(
+    "teachers",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("first_name", Text, nullable=False),
+    Column("email", String(200), nullable=False),
+)
+Table(
+    "children",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("first_name", String(200), nullable=False),
+    Column("last_name", String(200), nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+)
+Table(
+    "contacts",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("first_name", String(200), nullable=False),
+    Column("ph_number", String, nullable=False),
+    Column("emergency_contact", Boolean, server_default="false", nullable=False),
+    Column("email", String, server_default="No email provided", nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+)
+Table(
+    "groups",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("group_name", Text, nullable=False),
+    Column("day", String, nullable=False),
+    Column("teacher_id", Integer, ForeignKey("teachers.id"), nullable=False),
+)
+Table(
+    "comments",
+    metadata,
+    Column("comment_id", Integer, primary_key=True, autoincrement=True),
+    Column("message", Text, nullable=False),
+    Column("urgency", String, nullable=False),
+    Column("date_created", Date, nullable=False),
+    Column("comment_edited", Boolean, server_default="false", nullable=False),
+    Column("date_edited", Date),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("child_id", Integer, ForeignKey("children.id"), nullable=False),
+)
+Table(
+    "attendances",
+    metadata,
+    Column("attendance_id", Integer, primary_key=True, autoincrement=True),
+    Column("child_id", Integer, ForeignKey("children.id"), nullable=False),
+    Column("group_id", Integer, ForeignKey("groups.id"), nullable=False),
+    Column("contact_id", Integer, ForeignKey("contacts.id"), nullable=False),
+)
+
+
+def upgrade(connection):
+    metadata.create_all(connection, checkfirst=True)
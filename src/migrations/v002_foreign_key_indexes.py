@@ -0,0 +1,24 @@
+"""
+    Indexes the foreign key columns handlers filter and join on.
+Comments and attendances are most often selected by child, so their "child_id" indexes are
+composite, also covering lookups of one comment or group for a child.
+"""
+
+from sqlalchemy import text
+
+# "CREATE INDEX IF NOT EXISTS" is supported by both SQLite and Postgres
+INDEXES = {
+    "ix_children_user_id": "children (user_id)",
+    "ix_comments_child_id_comment_id": "comments (child_id, comment_id)",
+    "ix_comments_user_id": "comments (user_id)",
+    "ix_contacts_user_id": "contacts (user_id)",
+    "ix_groups_teacher_id": "groups (teacher_id)",
+    "ix_attendances_child_id_group_id": "attendances (child_id, group_id)",
+    "ix_attendances_group_id": "attendances (group_id)",
+    "ix_attendances_contact_id": "attendances (contact_id)",
+}
+
+
+def upgrade(connection):
+    for name, columns in INDEXES.items():
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}"))
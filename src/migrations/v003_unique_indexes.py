@@ -0,0 +1,39 @@
+"""
+    Adds the unique indexes that duplicate checks in the POST endpoints rely on, so inserts can use
+"ON CONFLICT DO NOTHING". The children and attendances indexes replace narrower ones from v002.
+"""
+
+from sqlalchemy import text
+
+UNIQUE_INDEXES = {
+    "uq_users_email": ("users", "email"),
+    "uq_children_user_id_first_name_last_name": (
+        "children",
+        "user_id, first_name, last_name",
+    ),
+    "uq_attendances_child_id_group_id": ("attendances", "child_id, group_id"),
+    "uq_groups_group_name_day": ("groups", "group_name, day"),
+    "uq_teachers_first_name_email": ("teachers", "first_name, email"),
+}
+
+# Indexes covered by the leading columns of the unique indexes
+REPLACED_INDEXES = ["ix_children_user_id", "ix_attendances_child_id_group_id"]
+
+
+def upgrade(connection):
+    for name, (table, columns) in UNIQUE_INDEXES.items():
+        # Existing duplicates must be resolved by hand, as this migration cannot tell which to keep
+        duplicate = connection.execute(
+            text(
+                f"SELECT {columns} FROM {table} GROUP BY {columns} HAVING COUNT(*) > 1"
+            )
+        ).first()
+        if duplicate is not None:
+            raise RuntimeError(
+                f"Cannot create {name}, {table} has duplicate rows for ({columns}): {tuple(duplicate)}"
+            )
+        connection.execute(
+            text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        )
+    for name in REPLACED_INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
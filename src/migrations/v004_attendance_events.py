@@ -0,0 +1,45 @@
+"""
+    Adds the append-only "attendance_events" table recording when children sign in to and out of groups.
+"""
+
+from sqlalchemy import (
+    MetaData,
+    Table,
+    Column,
+    Integer,
+    String,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+)
+
+metadata = MetaData()
+
+# The referenced tables only need to be known for the foreign keys
+for name in ["users", "children", "groups"]:
+    Table(name, metadata, Column("id", Integer, primary_key=True))
+
+attendance_events = Table(
+    "attendance_events",
+    metadata,
+    Column("event_id", Integer, primary_key=True, autoincrement=True),
+    Column("child_id", Integer, ForeignKey("children.id"), nullable=False),
+    Column(
+        "group_id",
+        Integer,
+        ForeignKey("groups.id", ondelete="CASCADE"),
+        nullable=False,
+    ),
+    Column("kind", String(10), nullable=False),
+    Column("day", Date, nullable=False),
+    Column("ts", DateTime, nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="SET NULL")),
+    Index("ix_attendance_events_group_id_day", "group_id", "day"),
+    Index("ix_attendance_events_child_id_ts", "child_id", "ts"),
+    Index("ix_attendance_events_user_id", "user_id"),
+)
+
+
+def upgrade(connection):
+    attendance_events.create(connection, checkfirst=True)
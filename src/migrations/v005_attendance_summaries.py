@@ -0,0 +1,31 @@
+"""
+    Adds the "attendance_summaries" table holding per group, per day attendance counts.
+Rows are filled in as attendances and events are written, "flask cli rebuild_summaries" fills in existing data.
+"""
+
+from sqlalchemy import MetaData, Table, Column, Integer, Date, ForeignKey
+
+metadata = MetaData()
+
+# The referenced table only needs to be known for the foreign key
+Table("groups", metadata, Column("id", Integer, primary_key=True))
+
+attendance_summaries = Table(
+    "attendance_summaries",
+    metadata,
+    Column(
+        "group_id",
+        Integer,
+        ForeignKey("groups.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column("day", Date, primary_key=True),
+    Column("enrolled", Integer, server_default="0", nullable=False),
+    Column("present", Integer, server_default="0", nullable=False),
+    Column("absent", Integer, server_default="0", nullable=False),
+    Column("late", Integer, server_default="0", nullable=False),
+)
+
+
+def upgrade(connection):
+    attendance_summaries.create(connection, checkfirst=True)
@@ -0,0 +1,33 @@
+"""
+    Adds the full-text index searched by "GET" "/comments/search": a GIN index over the messages' "tsvector" on
+PostgreSQL and an FTS5 table kept in step with "comments" by triggers on SQLite.
+"""
+
+from sqlalchemy import text
+
+# Must match search.TS_CONFIG, PostgreSQL only uses the index for queries with the same expression
+POSTGRESQL = [
+    "CREATE INDEX IF NOT EXISTS ix_comments_message_search ON comments "
+    "USING GIN (to_tsvector('english', message))",
+]
+
+# An external content table stores only the index, the messages stay in "comments"
+SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5("
+    "message, content='comments', content_rowid='comment_id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS comments_fts_insert AFTER INSERT ON comments BEGIN "
+    "INSERT INTO comments_fts (rowid, message) VALUES (new.comment_id, new.message); END",
+    "CREATE TRIGGER IF NOT EXISTS comments_fts_delete AFTER DELETE ON comments BEGIN "
+    "INSERT INTO comments_fts (comments_fts, rowid, message) VALUES ('delete', old.comment_id, old.message); END",
+    "CREATE TRIGGER IF NOT EXISTS comments_fts_update AFTER UPDATE OF message ON comments BEGIN "
+    "INSERT INTO comments_fts (comments_fts, rowid, message) VALUES ('delete', old.comment_id, old.message); "
+    "INSERT INTO comments_fts (rowid, message) VALUES (new.comment_id, new.message); END",
+    # Indexes the comments that already exist
+    "INSERT INTO comments_fts (comments_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade(connection):
+    statements = POSTGRESQL if connection.dialect.name == "postgresql" else SQLITE
+    for statement in statements:
+        connection.execute(text(statement))
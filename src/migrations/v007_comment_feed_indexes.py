@@ -0,0 +1,18 @@
+"""
+    Adds the indexes "GET" "/comments" reads the comment feed through, in "date_created" then "comment_id" order,
+with and without an "urgency" filter.
+"""
+
+from sqlalchemy import text
+
+INDEXES = {
+    "ix_comments_date_created_comment_id": "date_created, comment_id",
+    "ix_comments_urgency_date_created_comment_id": "urgency, date_created, comment_id",
+}
+
+
+def upgrade(connection):
+    for name, columns in INDEXES.items():
+        connection.execute(
+            text(f"CREATE INDEX IF NOT EXISTS {name} ON comments ({columns})")
+        )
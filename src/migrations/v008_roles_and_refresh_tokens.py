@@ -0,0 +1,41 @@
+"""
+    Adds the "role_version" column JWTs are checked against and the "refresh_tokens" table recording each
+issued refresh token.
+"""
+
+from sqlalchemy import (
+    MetaData,
+    Table,
+    Column,
+    Integer,
+    String,
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Index,
+    text,
+)
+
+metadata = MetaData()
+
+# The referenced table only needs to be known for the foreign key
+Table("users", metadata, Column("id", Integer, primary_key=True))
+
+refresh_tokens = Table(
+    "refresh_tokens",
+    metadata,
+    Column("jti", String(36), primary_key=True),
+    Column("expires", DateTime, nullable=False),
+    Column("revoked", Boolean, server_default="false", nullable=False),
+    Column("replaced_by", String(36)),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Index("ix_refresh_tokens_user_id", "user_id"),
+)
+
+
+def upgrade(connection):
+    # Existing users start at version 0, as new users do
+    connection.execute(
+        text("ALTER TABLE users ADD COLUMN role_version INTEGER NOT NULL DEFAULT 0")
+    )
+    refresh_tokens.create(connection)
@@ -0,0 +1,48 @@
+"""
+    Adds the "table_versions" table conditional GET requests build their validators from. Each table's version
+is spread over 16 rows keyed by ("table_name", "shard"), so concurrent writers to one table rarely update the
+same row.
+"""
+
+from datetime import datetime, timezone
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime
+
+SHARDS = 16
+
+# Tables whose rows are seeded, tables added later get theirs from their first write
+TABLES = [
+    "attendance_events",
+    "attendance_summaries",
+    "attendances",
+    "children",
+    "comments",
+    "contacts",
+    "groups",
+    "refresh_tokens",
+    "teachers",
+    "users",
+]
+
+metadata = MetaData()
+
+table_versions = Table(
+    "table_versions",
+    metadata,
+    Column("table_name", String(64), primary_key=True),
+    Column("shard", Integer, primary_key=True),
+    Column("version", Integer, server_default="0", nullable=False),
+    Column("updated", DateTime, nullable=False),
+)
+
+
+def upgrade(connection):
+    table_versions.create(connection)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    connection.execute(
+        table_versions.insert(),
+        [
+            {"table_name": name, "shard": shard, "version": 0, "updated": now}
+            for name in TABLES
+            for shard in range(SHARDS)
+        ],
+    )
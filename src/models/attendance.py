@@ -1,20 +1,24 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from marshmallow import fields
 from init import db, ma
 
 
 class Attendance(db.Model):
     __tablename__ = "attendances"
+    # A child attends each group once, attendances are also listed by child
+    __table_args__ = (
+        Index("uq_attendances_child_id_group_id", "child_id", "group_id", unique=True),
+    )
     attendance_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
     child_id: Mapped[int] = mapped_column(ForeignKey("children.id"))
     child: Mapped["Child"] = relationship(back_populates="attendances")
 
-    group_id: Mapped[int] = mapped_column(ForeignKey("groups.id"))
+    group_id: Mapped[int] = mapped_column(ForeignKey("groups.id"), index=True)
     group: Mapped["Group"] = relationship(back_populates="attendances")
 
-    contact_id: Mapped[int] = mapped_column(ForeignKey("contacts.id"))
+    contact_id: Mapped[int] = mapped_column(ForeignKey("contacts.id"), index=True)
     contact: Mapped["Contact"] = relationship(back_populates="attendances")
 
 
@@ -31,3 +35,9 @@ class AttendanceSchema(ma.Schema):
     class Meta:
         ordered = True
         fields = ("attendance_id", "child_id", "child", "group", "contact")
+
+
+class RollCallSchema(ma.Schema):
+    # One child's attendance in a group roll call
+    child_id = fields.Integer(required=True, strict=True)
+    contact_id = fields.Integer(required=True, strict=True)
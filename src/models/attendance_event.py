@@ -0,0 +1,41 @@
+from datetime import date, datetime
+from init import db, ma
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, ForeignKey, Date, DateTime, Index
+from marshmallow import fields
+from marshmallow.validate import OneOf
+
+# Kinds of event recorded when a child arrives at or leaves a group
+EVENT_KINDS = ("sign_in", "sign_out")
+
+
+class AttendanceEvent(db.Model):
+    __tablename__ = "attendance_events"
+    # Rows are only ever inserted
+    # Presence counts read a group's events for a range of days, a child's history reads their events by time
+    __table_args__ = (
+        Index("ix_attendance_events_group_id_day", "group_id", "day"),
+        Index("ix_attendance_events_child_id_ts", "child_id", "ts"),
+    )
+    event_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # Children with events cannot be deleted, so the groups' attendance history is kept
+    child_id: Mapped[int] = mapped_column(ForeignKey("children.id"))
+    group_id: Mapped[int] = mapped_column(ForeignKey("groups.id", ondelete="CASCADE"))
+    kind: Mapped[str] = mapped_column(String(10))
+    # The local day of "ts", stored so events can be selected and grouped by day through the index
+    day: Mapped[date] = mapped_column(Date)
+    ts: Mapped[datetime] = mapped_column(DateTime)
+    # The admin or teacher who recorded the event
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+
+
+class AttendanceEventSchema(ma.Schema):
+    # One event in a group's sign in or sign out request
+    child_id = fields.Integer(required=True, strict=True)
+    kind = fields.String(required=True, validate=OneOf(EVENT_KINDS))
+
+    class Meta:
+        ordered = True
+        fields = ("child_id", "kind")
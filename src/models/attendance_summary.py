@@ -0,0 +1,29 @@
+from datetime import date
+from init import db, ma
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey, Date, Integer
+from marshmallow import fields
+
+
+class AttendanceSummary(db.Model):
+    __tablename__ = "attendance_summaries"
+    # One row per group per day, kept up to date as attendances and attendance events are written
+    group_id: Mapped[int] = mapped_column(
+        ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    # Children enrolled in the group, as of the last enrolment change on the day
+    enrolled: Mapped[int] = mapped_column(Integer(), server_default="0")
+    # Children who signed in, enrolled children who did not, and children whose first sign in was after "LATE_AFTER"
+    present: Mapped[int] = mapped_column(Integer(), server_default="0")
+    absent: Mapped[int] = mapped_column(Integer(), server_default="0")
+    late: Mapped[int] = mapped_column(Integer(), server_default="0")
+
+
+class AttendanceSummarySchema(ma.Schema):
+    # Days are returned in ISO format, e.g. "2024-06-03"
+    day = fields.String()
+
+    class Meta:
+        ordered = True
+        fields = ("day", "enrolled", "present", "absent", "late")
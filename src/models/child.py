@@ -2,13 +2,23 @@ from typing import List
 from datetime import date
 from init import db, ma
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, Index
 from marshmallow import fields
 from marshmallow.validate import Regexp, And, Length
 
 
 class Child(db.Model):
     __tablename__ = "children"
+    # A user cannot register two children with the same name, children are also listed by user
+    __table_args__ = (
+        Index(
+            "uq_children_user_id_first_name_last_name",
+            "user_id",
+            "first_name",
+            "last_name",
+            unique=True,
+        ),
+    )
     id: Mapped[int] = mapped_column(primary_key=True,autoincrement=True)
     first_name: Mapped[str] = mapped_column(String(200))
     last_name: Mapped[str] = mapped_column(String(200))
@@ -17,10 +27,10 @@ class Child(db.Model):
     user: Mapped["User"] = relationship(back_populates="children")
 
     comments: Mapped[List["Comment"]] = relationship(
-        back_populates="child", cascade="all, delete"
+        back_populates="child", cascade="all, delete", order_by="Comment.comment_id"
     )
     attendances: Mapped[List["Attendance"]] = relationship(
-        back_populates="child", cascade="all, delete"
+        back_populates="child", cascade="all, delete", order_by="Attendance.attendance_id"
     )
 
 
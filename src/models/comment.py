@@ -1,13 +1,23 @@
 from datetime import date
 from init import db, ma
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Text, String, ForeignKey, Date, Boolean
+from sqlalchemy import Text, String, ForeignKey, Date, Boolean, Index
 from marshmallow import fields
-from marshmallow.validate import OneOf, Length
+from marshmallow.validate import OneOf, Length, Range
+
+# Values of a comment's "urgency"
+URGENCIES = ["urgent", "positive", "neutral"]
 
 
 class Comment(db.Model):
     __tablename__ = "comments"
+    # Comments are listed and looked up by child, and listed across children in the order they were created
+    # Their messages are searched through the full-text index added by migration v006, which differs between databases
+    __table_args__ = (
+        Index("ix_comments_child_id_comment_id", "child_id", "comment_id"),
+        Index("ix_comments_date_created_comment_id", "date_created", "comment_id"),
+        Index("ix_comments_urgency_date_created_comment_id", "urgency", "date_created", "comment_id"),
+    )
     comment_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     message: Mapped[str] = mapped_column(Text)
     urgency: Mapped[str] = mapped_column(String)
@@ -16,7 +26,7 @@ class Comment(db.Model):
     comment_edited: Mapped[bool] = mapped_column(Boolean(), server_default="false")
     date_edited: Mapped[date] = mapped_column(Date, nullable=True)
 
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     user: Mapped["User"] = relationship(back_populates="comments")
 
     child_id: Mapped[int] = mapped_column(ForeignKey("children.id"))
@@ -26,7 +36,7 @@ class Comment(db.Model):
 class CommentSchema(ma.Schema):
     message = fields.String(validate= Length(min=3, error = "Comments need to be at least 3 characters long"))
     date_created = fields.String()
-    urgency = fields.String(validate= OneOf(["urgent", "positive", "neutral"]))
+    urgency = fields.String(validate= OneOf(URGENCIES))
     
     user = fields.Nested("UserSchema", only=['first_name', "id"])
     child = fields.Nested("ChildSchema", only=["id", "first_name", "last_name"])
@@ -34,3 +44,25 @@ class CommentSchema(ma.Schema):
     class Meta:
         ordered = True
         fields = ("child", "user", "comment_edited", "date_edited", "date_created", "urgency", "message")
+
+
+class CommentListSchema(CommentSchema):
+    # Comments listed by "GET" "/comments" and "GET" "/comments/search" are identified by their "comment_id"
+    class Meta(CommentSchema.Meta):
+        fields = ("comment_id",) + CommentSchema.Meta.fields
+
+
+class CommentSearchSchema(ma.Schema):
+    # The "?q=", "?urgency=", "?from=", "?to=" and "?limit=" values of a comment search
+    q = fields.String(required=True, validate=Length(min=1, max=200))
+    urgency = fields.String(validate=OneOf(URGENCIES))
+    first = fields.Date(data_key="from")
+    last = fields.Date(data_key="to")
+    limit = fields.Integer(validate=Range(min=1))
+
+
+class CommentFeedSchema(ma.Schema):
+    # The "?since=", "?urgency=" and "?limit=" values of the comment feed
+    since = fields.String()
+    urgency = fields.String(validate=OneOf(URGENCIES))
+    limit = fields.Integer(validate=Range(min=1))
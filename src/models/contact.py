@@ -14,11 +14,11 @@ class Contact(db.Model):
     emergency_contact: Mapped[bool] = mapped_column(server_default="false")
     email: Mapped[str] = mapped_column(server_default="No email provided")
 
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     user: Mapped["User"] = relationship(back_populates="contacts")
 
     attendances: Mapped[List["Attendance"]] = relationship(
-        back_populates="contact", cascade="all, delete"
+        back_populates="contact", cascade="all, delete", order_by="Attendance.attendance_id"
     )
 
 
@@ -1,22 +1,24 @@
 from typing import List
 from init import db, ma
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Text, ForeignKey, String
+from sqlalchemy import Text, ForeignKey, String, Index
 from marshmallow import fields
 from marshmallow.validate import And, Regexp, Length, OneOf
 
 
 class Group(db.Model):
     __tablename__ = "groups"
+    # Each group name can only be registered once per day
+    __table_args__ = (Index("uq_groups_group_name_day", "group_name", "day", unique=True),)
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     group_name: Mapped[str] = mapped_column(Text)
     day: Mapped[str] = mapped_column(String)
 
-    teacher_id: Mapped[int] = mapped_column(ForeignKey("teachers.id"))
+    teacher_id: Mapped[int] = mapped_column(ForeignKey("teachers.id"), index=True)
     teacher: Mapped["Teacher"] = relationship(back_populates="groups")
 
     attendances: Mapped[List["Attendance"]] = relationship(
-        back_populates="group", cascade="all, delete"
+        back_populates="group", cascade="all, delete", order_by="Attendance.attendance_id"
     )
 
 
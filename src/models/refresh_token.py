@@ -0,0 +1,18 @@
+from typing import Optional
+from datetime import datetime
+from init import db
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, ForeignKey, DateTime, Boolean
+
+
+class RefreshToken(db.Model):
+    __tablename__ = "refresh_tokens"
+    # The "jti" claim of the issued refresh token
+    jti: Mapped[str] = mapped_column(String(36), primary_key=True)
+    expires: Mapped[datetime] = mapped_column(DateTime)
+    revoked: Mapped[bool] = mapped_column(Boolean(), server_default="false")
+    # "jti" of the token issued when this one was rotated
+    replaced_by: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user: Mapped["User"] = relationship(back_populates="refresh_tokens")
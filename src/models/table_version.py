@@ -0,0 +1,19 @@
+from datetime import datetime
+from init import db
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, DateTime
+
+# Rows each table's version is spread over, so concurrent writers to a table rarely update the same row
+VERSION_SHARDS = 16
+
+
+class TableVersion(db.Model):
+    __tablename__ = "table_versions"
+    # Name of the table whose rows changed
+    table_name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # Row of the table's version a transaction updates, picked at random
+    shard: Mapped[int] = mapped_column(Integer(), primary_key=True)
+    # Incremented by every transaction that inserts, updates or deletes rows in the table, the version is the sum
+    version: Mapped[int] = mapped_column(Integer(), server_default="0")
+    # UTC time of the last change, the table's is the latest of its rows
+    updated: Mapped[datetime] = mapped_column(DateTime)
@@ -1,19 +1,23 @@
 from typing import List
 from init import db, ma
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Text, String
+from sqlalchemy import Text, String, Index
 from marshmallow import fields
 from marshmallow.validate import Length, Regexp, And
 
 
 class Teacher(db.Model):
     __tablename__ = "teachers"
+    # Each teacher can only be registered once
+    __table_args__ = (
+        Index("uq_teachers_first_name_email", "first_name", "email", unique=True),
+    )
     id: Mapped[int] = mapped_column(autoincrement=True, primary_key=True)
     first_name: Mapped[str] = mapped_column(Text)
     email: Mapped[str] = mapped_column(String(200))
 
     groups: Mapped[List["Group"]] = relationship(
-        back_populates="teacher", cascade="all, delete"
+        back_populates="teacher", cascade="all, delete", order_by="Group.id"
     )
 
 
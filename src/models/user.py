@@ -1,29 +1,37 @@
 from typing import Optional, List
 from init import db, ma
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Boolean
+from sqlalchemy import String, Boolean, Integer, Index
 from marshmallow import fields
 from marshmallow.validate import Length, And, Regexp
 
 
 class User(db.Model):
     __tablename__ = "users"
+    # Each email can only be registered once
+    __table_args__ = (Index("uq_users_email", "email", unique=True),)
     id: Mapped[int] = mapped_column(autoincrement=True, primary_key=True)
     email: Mapped[str] = mapped_column(String(200))
     password: Mapped[Optional[str]] = mapped_column(String(200))
     first_name: Mapped[str] = mapped_column(String(200))
     is_admin: Mapped[bool] = mapped_column(Boolean(), server_default="false")
     is_teacher: Mapped[bool] = mapped_column(Boolean(), server_default="false")
+    # Incremented whenever "is_admin" or "is_teacher" changes, invalidating previously issued tokens
+    role_version: Mapped[int] = mapped_column(Integer(), server_default="0")
 
     children: Mapped[List["Child"]] = relationship(
-        back_populates="user", cascade="all, delete"
+        back_populates="user", cascade="all, delete", order_by="Child.id"
     )
 
     comments: Mapped[List["Comment"]] = relationship(
-        back_populates="user", cascade="all, delete"
+        back_populates="user", cascade="all, delete", order_by="Comment.comment_id"
     )
 
     contacts: Mapped[List["Contact"]] = relationship(
+        back_populates="user", cascade="all, delete", order_by="Contact.id"
+    )
+
+    refresh_tokens: Mapped[List["RefreshToken"]] = relationship(
         back_populates="user", cascade="all, delete"
     )
 
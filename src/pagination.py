@@ -0,0 +1,131 @@
+"""
+    Keyset pagination for collection endpoints using "?limit=" and opaque "?after=" cursors
+"""
+
+from datetime import date
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from flask import request, url_for
+from marshmallow.exceptions import ValidationError
+from init import app, db
+from serializers import fast_dump
+from streaming import stream_collection
+
+
+def encode_cursor(key):
+    """Returns an opaque cursor for the last key value of a page."""
+    return urlsafe_b64encode(f"k:{key}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns the key value stored in a cursor, or raises ValueError if it is not one."""
+    try:
+        value = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (Base64Error, UnicodeDecodeError):
+        raise ValueError(cursor)
+    if not value.startswith("k:"):
+        raise ValueError(cursor)
+    return int(value[2:])
+
+
+def encode_date_cursor(day, key):
+    """Returns an opaque cursor for the last (day, key) values of a page ordered by a date then an id."""
+    return urlsafe_b64encode(f"d:{day.isoformat()}:{key}".encode()).decode().rstrip("=")
+
+
+def decode_date_cursor(cursor):
+    """Returns the (day, key) values stored in a date cursor, or raises ValueError if it is not one."""
+    try:
+        value = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (Base64Error, UnicodeDecodeError):
+        raise ValueError(cursor)
+    prefix, _, rest = value.partition(":")
+    day, _, key = rest.partition(":")
+    if prefix != "d":
+        raise ValueError(cursor)
+    return date.fromisoformat(day), int(key)
+
+
+def result_limit(limit):
+    """Returns how many rows a request that always pages may return, its "?limit=" value or "MAX_PAGE_SIZE" without one.
+    A limit above "MAX_PAGE_SIZE" raises a ValidationError, returned to the user as a 400 error.
+    """
+    maximum = app.config["MAX_PAGE_SIZE"]
+    if limit is None:
+        return maximum
+    if limit > maximum:
+        raise ValidationError(
+            {"limit": [f"Must be a whole number between 1 and {maximum}"]}
+        )
+    return limit
+
+
+def page_args():
+    """Returns (limit, after) from the request's "?limit=" and "?after=" values.
+    limit is None when the client asks for the whole collection and no "DEFAULT_PAGE_SIZE" is set.
+    Invalid values raise a ValidationError, returned to the user as a 400 error.
+    """
+    errors = {}
+    maximum = app.config["MAX_PAGE_SIZE"]
+    limit = request.args.get("limit", app.config["DEFAULT_PAGE_SIZE"] or None)
+    after = request.args.get("after")
+    if after is not None:
+        try:
+            after = decode_cursor(after)
+        except ValueError:
+            errors["after"] = ["Not a valid cursor"]
+        # A cursor without a limit continues with the largest page size
+        limit = maximum if limit is None else limit
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= maximum:
+            errors["limit"] = [f"Must be a whole number between 1 and {maximum}"]
+    if errors:
+        raise ValidationError(errors)
+    return limit, after
+
+
+def keyset(stmt, column, limit, after):
+    """Restricts stmt to the rows after the cursor ordered by the indexed column.
+    One extra row is selected so split_page can tell whether another page follows.
+    """
+    if after is not None:
+        stmt = stmt.where(column > after)
+    return stmt.order_by(column).limit(limit + 1)
+
+
+def split_page(rows, limit, column):
+    """Returns the rows on this page and the cursor of the next page, or None on the last page."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(getattr(rows[-1], column.key))
+    return rows, None
+
+
+def page_headers(cursor, arg="after"):
+    """Returns the "X-Next-Cursor" and "Link" headers pointing to the next page, if there is one.
+    The link passes the cursor in the "?<arg>=" value, "?after=" unless given.
+    """
+    if cursor is None:
+        return {}
+    args = request.args.to_dict()
+    args[arg] = cursor
+    # The URL's own values win over query string values with the same name, e.g. "?id="
+    next_url = url_for(request.endpoint, **{**args, **request.view_args})
+    return {"X-Next-Cursor": cursor, "Link": f'<{next_url}>; rel="next"'}
+
+
+def collection_response(stmt, schema, column):
+    """Returns the response for a collection endpoint selecting stmt, dumped with schema.
+    Unpaged requests stream the whole collection. Paged requests return one page.
+    """
+    limit, after = page_args()
+    # Both kinds of request return rows in id order, whichever index the database uses
+    if limit is None:
+        return stream_collection(stmt.order_by(column), schema)
+    rows = db.session.scalars(keyset(stmt, column, limit, after)).all()
+    rows, cursor = split_page(rows, limit, column)
+    return fast_dump(schema, rows), 200, page_headers(cursor)
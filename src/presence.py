@@ -0,0 +1,123 @@
+"""
+    Daily and weekly presence counts of a group, aggregated in SQL from its attendance events
+"""
+
+from datetime import date, timedelta
+from flask import request
+from marshmallow.exceptions import ValidationError
+from sqlalchemy import Date, Time, case, distinct, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from init import db
+from models.attendance_event import AttendanceEvent
+
+
+class week_start(FunctionElement):
+    """SQL expression for the Monday of the week a date falls in."""
+
+    type = Date()
+    inherit_cache = True
+
+
+@compiles(week_start)
+def _week_start_sqlite(element, compiler, **kw):
+    # The first Monday on or after six days earlier
+    return f"date({compiler.process(element.clauses, **kw)}, '-6 days', 'weekday 1')"
+
+
+@compiles(week_start, "postgresql")
+def _week_start_postgresql(element, compiler, **kw):
+    return (
+        f"CAST(date_trunc('week', {compiler.process(element.clauses, **kw)}) AS DATE)"
+    )
+
+
+class time_of_day(FunctionElement):
+    """SQL expression for the time part of a timestamp."""
+
+    type = Time()
+    inherit_cache = True
+
+
+@compiles(time_of_day)
+def _time_of_day_sqlite(element, compiler, **kw):
+    return f"time({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(time_of_day, "postgresql")
+def _time_of_day_postgresql(element, compiler, **kw):
+    return f"CAST({compiler.process(element.clauses, **kw)} AS TIME)"
+
+
+def date_range(default_days):
+    """Returns (first, last) days from the request's "?from=" and "?to=" ISO dates, e.g. "2024-06-03".
+    Without them the range is the default_days days ending today.
+    Invalid values raise a ValidationError, returned to the user as a 400 error.
+    """
+    errors, days = {}, {}
+    for arg in ("from", "to"):
+        if arg in request.args:
+            try:
+                days[arg] = date.fromisoformat(request.args[arg])
+            except ValueError:
+                errors[arg] = ["Not a valid date."]
+    if errors:
+        raise ValidationError(errors)
+    last = days.get("to", date.today())
+    first = days.get("from", last - timedelta(days=default_days - 1))
+    if first > last:
+        raise ValidationError({"from": ["Must not be after 'to'"]})
+    return first, last
+
+
+def _group_days(group_id, first, last):
+    # Served by the (group_id, day) index whatever the table's size
+    return (
+        AttendanceEvent.group_id == group_id,
+        AttendanceEvent.day.between(first, last),
+    )
+
+
+def daily_presence(group_id, first, last):
+    """Returns the number of children who signed in to and out of the group on each day with events."""
+    present = func.count(
+        distinct(case((AttendanceEvent.kind == "sign_in", AttendanceEvent.child_id)))
+    )
+    signed_out = func.count(
+        distinct(case((AttendanceEvent.kind == "sign_out", AttendanceEvent.child_id)))
+    )
+    stmt = (
+        db.select(AttendanceEvent.day, present, signed_out)
+        .where(*_group_days(group_id, first, last))
+        .group_by(AttendanceEvent.day)
+        .order_by(AttendanceEvent.day)
+    )
+    return [
+        {"day": day.isoformat(), "present": present, "signed_out": signed_out}
+        for day, present, signed_out in db.session.execute(stmt)
+    ]
+
+
+def weekly_presence(group_id, first, last):
+    """Returns, for each week from Monday with events, how many different children signed in to the
+    group and the total of children present on each day of the week.
+    The range is widened to whole weeks, from the Monday of first to the Sunday of last.
+    """
+    first -= timedelta(days=first.weekday())
+    last += timedelta(days=6 - last.weekday())
+    child_days = (
+        db.select(AttendanceEvent.day, AttendanceEvent.child_id)
+        .where(*_group_days(group_id, first, last), AttendanceEvent.kind == "sign_in")
+        .distinct()
+        .subquery()
+    )
+    week = week_start(child_days.c.day)
+    stmt = (
+        db.select(week, func.count(distinct(child_days.c.child_id)), func.count())
+        .group_by(week)
+        .order_by(week)
+    )
+    return [
+        {"week": week.isoformat(), "children": children, "child_days": days}
+        for week, children, days in db.session.execute(stmt)
+    ]
@@ -0,0 +1,142 @@
+"""
+    Token bucket rate limiting shared by every worker process on a node
+"""
+
+import sqlite3
+from functools import lru_cache
+from math import ceil
+from threading import local
+from time import time
+from flask import request
+from flask_jwt_extended import decode_token
+from init import app
+
+
+# Each thread keeps its own connection to the bucket store
+_connections = local()
+
+# Seconds a request waits for another worker's lock on the store before it is allowed through
+LOCK_TIMEOUT = 0.05
+
+# Seconds between deletions of full buckets, and when this process next deletes them
+PRUNE_INTERVAL = 60
+_next_prune = 0.0
+
+
+@lru_cache(maxsize=4)
+def parse_limits(value):
+    """Parses "name=requests/seconds" pairs separated by commas into a dict of (capacity, seconds) tuples."""
+    limits = {}
+    for pair in value.split(","):
+        if pair.strip():
+            name, limit = pair.split("=")
+            capacity, seconds = limit.split("/")
+            limits[name.strip()] = (int(capacity), float(seconds))
+    return limits
+
+
+def _store():
+    # Opens the file-backed store on first use in this thread
+    # All workers using the same file see the same buckets
+    connection = getattr(_connections, "connection", None)
+    if connection is None:
+        connection = sqlite3.connect(
+            app.config["RATE_LIMIT_STORE"], timeout=LOCK_TIMEOUT, isolation_level=None
+        )
+        # Buckets are disposable, so writes skip fsync and readers never wait for the writer
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+        )
+        _connections.connection = connection
+    return connection
+
+
+def take_token(key, capacity, seconds):
+    """Removes one token from the bucket stored under key and returns 0 if one was available.
+    Otherwise returns the number of seconds until the next token is refilled.
+    Buckets hold "capacity" tokens and refill completely over "seconds".
+    """
+    connection = _store()
+    now = time()
+    rate = capacity / seconds
+    try:
+        # Locks the store so concurrent workers cannot take the same token
+        connection.execute("BEGIN IMMEDIATE")
+        row = connection.execute(
+            "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+        ).fetchone()
+        tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        connection.execute(
+            "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+            (key, tokens, now),
+        )
+        connection.execute("COMMIT")
+    # If the store is unavailable or stays locked, the request is allowed rather than failing
+    except sqlite3.Error:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        return 0
+    return 0 if allowed else (1 - tokens) / rate
+
+
+def prune_buckets(limits):
+    """Deletes the buckets untouched for longer than the slowest limit takes to refill, at most every
+    "PRUNE_INTERVAL" seconds per process. A full bucket behaves like a missing one, so no client is affected.
+    """
+    global _next_prune
+    now = time()
+    if now < _next_prune:
+        return
+    _next_prune = now + PRUNE_INTERVAL
+    oldest = now - max(seconds for _, seconds in limits.values())
+    try:
+        _store().execute("DELETE FROM buckets WHERE updated < ?", (oldest,))
+    # Pruning is retried after the next interval if the store is locked
+    except sqlite3.Error:
+        pass
+
+
+def _request_identity():
+    # Returns the user id of a valid access token in the request header, or None
+    # The token is only decoded here; @jwt_required() still performs the full checks
+    header = request.headers.get("Authorization", "")
+    if not header.startswith("Bearer "):
+        return None
+    try:
+        return decode_token(header[len("Bearer ") :])["sub"]
+    except Exception:
+        return None
+
+
+def rate_limit():
+    """Checks the requesting client's bucket before the endpoint and its @jwt_required() run.
+    The limit is chosen by endpoint name, then blueprint name, then "default".
+    Requests with a valid token are limited per user, all others per IP address.
+    """
+    if not app.config["RATE_LIMIT_ENABLED"] or request.endpoint is None:
+        return None
+    limits = parse_limits(app.config["RATE_LIMITS"])
+    for scope in (request.endpoint, request.blueprint, "default"):
+        if scope in limits:
+            break
+    else:
+        return None
+    user_id = _request_identity()
+    if user_id is not None:
+        key = f"user:{user_id}:{scope}"
+    else:
+        key = f"ip:{request.remote_addr}:{scope}"
+    wait = take_token(key, *limits[scope])
+    prune_buckets(limits)
+    if wait:
+        return (
+            {"Error": "Too many requests. Please try again later"},
+            429,
+            {"Retry-After": str(ceil(wait))},
+        )
+    return None
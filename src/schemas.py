@@ -0,0 +1,31 @@
+"""
+    Stores marshmallow schema instances so each variant is only built once per process
+"""
+
+from threading import Lock
+
+
+# Stores schema instances by schema class and constructor options
+_schemas = {}
+_lock = Lock()
+
+
+def _freeze(value):
+    # Converts list and set options into hashable tuples for the registry key
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(value)
+    return value
+
+
+def cached_schema(schema_class, **options):
+    """Returns a shared instance of schema_class built with the given options.
+    Accepts the same options as the schema's constructor, e.g. only, exclude, many and unknown.
+    Nested schemas and field sets are resolved on first use and then reused by every request.
+    Example: cached_schema(ChildSchema, only=["first_name", "last_name"], many=True)
+    """
+    key = (schema_class, tuple(sorted((k, _freeze(v)) for k, v in options.items())))
+    schema = _schemas.get(key)
+    if schema is None:
+        with _lock:
+            schema = _schemas.setdefault(key, schema_class(**options))
+    return schema
@@ -0,0 +1,48 @@
+"""
+    Full-text search over comment messages, using the index added by migration v006 on PostgreSQL or SQLite
+"""
+
+from marshmallow.exceptions import ValidationError
+from sqlalchemy import func, literal_column, table, column
+from init import db
+from models.comment import Comment
+
+# Text search configuration of the PostgreSQL index, queries must use the same one for it to be used
+TS_CONFIG = "english"
+# Written into the statement rather than bound, so it matches the index expression with any driver
+_ts_config = literal_column(f"'{TS_CONFIG}'")
+
+# The SQLite FTS5 table, "rank" orders its matches best first
+_comments_fts = table("comments_fts", column("rowid"), column("rank"))
+
+
+def search_terms(q):
+    """Returns the words of a search, raising a ValidationError, returned as a 400 error, if there are none."""
+    words = q.split()
+    if not words:
+        raise ValidationError({"q": ["Must contain a word to search for"]})
+    return words
+
+
+def comment_matches(words):
+    """Returns a subquery of the "comment_id" and "rank" of every comment whose message contains all of words.
+    Lower ranks are better matches. Words are matched by their stem, e.g. "bites" matches "biting".
+    """
+    # Read from the primary engine, whose dialect the replica shares, as asking the session would route the search
+    if db.engine.dialect.name == "postgresql":
+        document = func.to_tsvector(_ts_config, Comment.message)
+        query = func.plainto_tsquery(_ts_config, " ".join(words))
+        return (
+            db.select(
+                Comment.comment_id, (-func.ts_rank(document, query)).label("rank")
+            )
+            .where(document.bool_op("@@")(query))
+            .subquery()
+        )
+    # Each word is quoted so FTS5 reads operators and punctuation in the search as plain text
+    query = " ".join('"' + word.replace('"', '""') + '"' for word in words)
+    return (
+        db.select(_comments_fts.c.rowid.label("comment_id"), _comments_fts.c.rank)
+        .where(literal_column("comments_fts").match(query))
+        .subquery()
+    )
@@ -0,0 +1,90 @@
+"""
+    Compiles marshmallow schema instances into plain functions that dump SQLAlchemy objects
+"""
+
+from threading import Lock
+from marshmallow import fields
+
+
+# Value types an Inferred field returns unchanged
+PLAIN_TYPES = frozenset([str, int, float, bool, type(None)])
+
+# Stores compiled functions by schema instance
+_compiled = {}
+_lock = Lock()
+
+
+def _nested_schema(field):
+    # Returns (schema, many) for Nested and List(Nested) fields, or None for other fields
+    if isinstance(field, fields.Nested):
+        return field.schema, field.many
+    if isinstance(field, fields.List) and isinstance(field.inner, fields.Nested):
+        return field.inner.schema, True
+    return None
+
+
+def _has_dump_hooks(schema):
+    # Returns True if the schema declares pre_dump or post_dump methods
+    return any(
+        schema._hooks.get((tag, many))
+        for tag in ("pre_dump", "post_dump")
+        for many in (True, False)
+    )
+
+
+def _compile_one(schema):
+    # Builds the source of a function returning the same dict as schema.dump(obj) for one object
+    # Values are read with getattr and converted with the same rules as each marshmallow field
+    # Field types without a fast path call the field's own _serialize
+    namespace = {"PLAIN_TYPES": PLAIN_TYPES}
+    lines = ["def dump_one(obj):"]
+    items = []
+    for index, (name, field) in enumerate(schema.dump_fields.items()):
+        value = f"v{index}"
+        attribute = field.attribute or name
+        key = field.data_key if field.data_key is not None else name
+        namespace[f"f{index}"] = field
+        lines.append(f"    {value} = getattr(obj, {attribute!r})")
+        nested = _nested_schema(field)
+        if nested is not None and not _has_dump_hooks(nested[0]):
+            namespace[f"n{index}"] = compiled_dump_one(nested[0])
+            if nested[1]:
+                expression = f"None if {value} is None else [n{index}(x) for x in {value}]"
+            else:
+                expression = f"None if {value} is None else n{index}({value})"
+        elif type(field) in (fields.String, fields.Email):
+            expression = f"None if {value} is None else str({value})"
+        elif isinstance(field, fields.Inferred):
+            expression = f"{value} if type({value}) in PLAIN_TYPES else f{index}._serialize({value}, {attribute!r}, obj)"
+        else:
+            expression = f"f{index}._serialize({value}, {attribute!r}, obj)"
+        items.append(f"        {key!r}: {expression},")
+    lines += ["    return {"] + items + ["    }"]
+    exec("\n".join(lines), namespace)
+    return namespace["dump_one"]
+
+
+def compiled_dump_one(schema):
+    """Returns the compiled single-object dump function for a schema instance.
+    Schemas with pre_dump or post_dump hooks fall back to marshmallow.
+    """
+    dump_one = _compiled.get(schema)
+    if dump_one is None:
+        if _has_dump_hooks(schema):
+            dump_one = lambda obj: schema.dump(obj, many=False)
+        else:
+            dump_one = _compile_one(schema)
+        with _lock:
+            dump_one = _compiled.setdefault(schema, dump_one)
+    return dump_one
+
+
+def fast_dump(schema, obj):
+    """Returns the same data as schema.dump(obj) without marshmallow's per-field machinery.
+    Intended for schema instances returned by schemas.cached_schema, which live for the whole process.
+    Example: fast_dump(cached_schema(ChildSchema, many=True), children)
+    """
+    dump_one = compiled_dump_one(schema)
+    if schema.many:
+        return [dump_one(item) for item in obj]
+    return dump_one(obj)
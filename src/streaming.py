@@ -0,0 +1,60 @@
+"""
+    Streams collection endpoint results as JSON arrays without holding every row in memory
+"""
+
+from flask import current_app, stream_with_context
+from init import app, db
+from serializers import compiled_dump_one
+from formats import JSON, response_type, encode, collection_parts, array_header
+
+
+def stream_collection(stmt, schema):
+    """Returns a response streaming the rows selected by stmt as a JSON array dumped with schema.
+    Rows are fetched "STREAM_BATCH_SIZE" at a time, through a server-side cursor where the database
+    supports one, and each batch is encoded and sent before the next is loaded.
+    The streamed bytes are identical to returning the dumped list from the endpoint, in JSON or in the
+    MessagePack or CBOR format negotiated by the "Accept" header.
+    """
+    dump_one = compiled_dump_one(schema)
+    stmt = stmt.execution_options(yield_per=app.config["STREAM_BATCH_SIZE"])
+    mimetype = response_type()
+    if mimetype == JSON:
+        encode_one = current_app.json.compact_bytes
+        start, separator, end = b"[", b",", b"]\n"
+    else:
+        encode_one = lambda obj: encode(obj, mimetype)
+        parts = collection_parts(mimetype)
+        # MessagePack arrays begin with their length, so the encoded rows are sent at the end
+        if parts is None:
+            return _buffered_collection(stmt, dump_one, encode_one, mimetype)
+        start, separator, end = parts
+
+    def generate():
+        prefix = start
+        for batch in db.session.scalars(stmt).partitions():
+            yield prefix + separator.join(encode_one(dump_one(row)) for row in batch)
+            prefix = separator
+        # An empty collection never yields a batch
+        yield start + end if prefix is start else end
+
+    # Keeps the request context, and with it the database session, open while streaming
+    response = current_app.response_class(
+        stream_with_context(generate()), mimetype=mimetype
+    )
+    response.vary.add("Accept")
+    return response
+
+
+def _buffered_collection(stmt, dump_one, encode_one, mimetype):
+    # Rows are still loaded in batches, only their encoded bytes are held until the end
+    def generate():
+        items = []
+        for batch in db.session.scalars(stmt).partitions():
+            items.extend(encode_one(dump_one(row)) for row in batch)
+        yield array_header(len(items)) + b"".join(items)
+
+    response = current_app.response_class(
+        stream_with_context(generate()), mimetype=mimetype
+    )
+    response.vary.add("Accept")
+    return response
@@ -0,0 +1,210 @@
+"""
+    Per group, per day attendance summaries updated in the transaction of every attendance or event write
+"""
+
+from datetime import date, time
+from sqlalchemy import case, func
+from init import app, db
+from inserts import dialect_insert
+from presence import time_of_day
+from models.attendance import Attendance
+from models.attendance_event import AttendanceEvent
+from models.attendance_summary import AttendanceSummary
+from models.group import Group
+
+
+def late_after():
+    """Returns the "LATE_AFTER" time, e.g. 09:00, after which a child's first sign in of the day is late."""
+    return time.fromisoformat(app.config["LATE_AFTER"])
+
+
+def _absent(enrolled, present):
+    # Children who left the group after signing in could make the difference negative
+    return case((enrolled > present, enrolled - present), else_=0)
+
+
+def _enrolment(group_id):
+    return (
+        db.select(func.count()).where(Attendance.group_id == group_id).scalar_subquery()
+    )
+
+
+def refresh_enrolment(group_ids):
+    """Sets today's "enrolled" and "absent" counts of each group from its attendances.
+    Called after an attendance is added, moved or deleted, before the change is committed.
+    """
+    today = date.today()
+    for group_id in sorted(set(group_ids)):
+        enrolled = _enrolment(group_id)
+        stmt = dialect_insert(AttendanceSummary).values(
+            group_id=group_id,
+            day=today,
+            enrolled=enrolled,
+            present=0,
+            absent=enrolled,
+            late=0,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["group_id", "day"],
+            set_={
+                "enrolled": stmt.excluded.enrolled,
+                "absent": _absent(stmt.excluded.enrolled, AttendanceSummary.present),
+            },
+        )
+        db.session.execute(stmt)
+
+
+def lock_day(group_id, day):
+    """Creates the summary row of a group on day if it is missing, and locks it until the transaction ends.
+    Called before a group's sign ins are recorded, so concurrent requests recording them for the same day take
+    turns and each recount in record_presence() sees the events of the requests before it.
+    """
+    enrolled = _enrolment(group_id)
+    stmt = dialect_insert(AttendanceSummary).values(
+        group_id=group_id,
+        day=day,
+        enrolled=enrolled,
+        present=0,
+        absent=enrolled,
+        late=0,
+    )
+    # Writing the row's own value back takes the row lock without changing it
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["group_id", "day"],
+        set_={"present": AttendanceSummary.present},
+    )
+    db.session.execute(stmt)
+
+
+def record_presence(group_id, day):
+    """Sets the "present" and "late" counts of a group on day from the children's first sign ins that day.
+    Called after the sign ins are added, in the transaction that took the row's lock with lock_day().
+    """
+    first_sign_ins = (
+        db.select(func.min(AttendanceEvent.ts).label("ts"))
+        .where(
+            AttendanceEvent.group_id == group_id,
+            AttendanceEvent.day == day,
+            AttendanceEvent.kind == "sign_in",
+        )
+        .group_by(AttendanceEvent.child_id)
+        .subquery()
+    )
+    present = db.select(func.count()).select_from(first_sign_ins).scalar_subquery()
+    late = (
+        db.select(func.count())
+        .select_from(first_sign_ins)
+        .where(time_of_day(first_sign_ins.c.ts) > late_after())
+        .scalar_subquery()
+    )
+    stmt = (
+        db.update(AttendanceSummary)
+        .where(AttendanceSummary.group_id == group_id, AttendanceSummary.day == day)
+        .values(
+            present=present,
+            absent=_absent(AttendanceSummary.enrolled, present),
+            late=late,
+        )
+    )
+    db.session.execute(stmt)
+
+
+def recompute():
+    """Returns every summary row recomputed from attendances and attendance events, keyed by (group_id, day),
+    as (enrolled, present, absent, late) tuples.
+    Enrolments are not dated, so only today's "enrolled" count can be recomputed. Earlier days keep their stored
+    count, or use today's when they have no row yet.
+    """
+    today = date.today()
+    # Each child's first sign in to a group on each day
+    first_sign_ins = (
+        db.select(
+            AttendanceEvent.group_id,
+            AttendanceEvent.day,
+            func.min(AttendanceEvent.ts).label("ts"),
+        )
+        .where(
+            AttendanceEvent.kind == "sign_in",
+            AttendanceEvent.group_id.in_(db.select(Group.id)),
+        )
+        .group_by(
+            AttendanceEvent.group_id, AttendanceEvent.day, AttendanceEvent.child_id
+        )
+        .subquery()
+    )
+    late = case((time_of_day(first_sign_ins.c.ts) > late_after(), 1), else_=0)
+    stmt = db.select(
+        first_sign_ins.c.group_id,
+        first_sign_ins.c.day,
+        func.count(),
+        func.sum(late),
+    ).group_by(first_sign_ins.c.group_id, first_sign_ins.c.day)
+    presence = {
+        (group_id, day): (present, late)
+        for group_id, day, present, late in db.session.execute(stmt)
+    }
+    stmt = db.select(Attendance.group_id, func.count()).group_by(Attendance.group_id)
+    enrolment = dict(db.session.execute(stmt).tuples().all())
+    # Rows left by deleted groups, where the database does not cascade deletes, are dropped
+    stmt = db.select(
+        AttendanceSummary.group_id, AttendanceSummary.day, AttendanceSummary.enrolled
+    ).where(AttendanceSummary.group_id.in_(db.select(Group.id)))
+    snapshots = {
+        (group_id, day): enrolled
+        for group_id, day, enrolled in db.session.execute(stmt)
+    }
+    rows = {}
+    # Rows exist for days with sign ins and days with enrolment changes, which only the stored rows record
+    for group_id, day in set(presence) | set(snapshots):
+        if day < today and (group_id, day) in snapshots:
+            enrolled = snapshots[(group_id, day)]
+        else:
+            enrolled = enrolment.get(group_id, 0)
+        present, late = presence.get((group_id, day), (0, 0))
+        rows[(group_id, day)] = (enrolled, present, max(enrolled - present, 0), late)
+    return rows
+
+
+def stored():
+    """Returns every stored summary row keyed by (group_id, day), as (enrolled, present, absent, late) tuples."""
+    stmt = db.select(
+        AttendanceSummary.group_id,
+        AttendanceSummary.day,
+        AttendanceSummary.enrolled,
+        AttendanceSummary.present,
+        AttendanceSummary.absent,
+        AttendanceSummary.late,
+    )
+    return {(row[0], row[1]): tuple(row[2:]) for row in db.session.execute(stmt)}
+
+
+def differences(expected, actual):
+    """Returns a description of each row that differs between two sets of summary rows, in key order."""
+    lines = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key) != actual.get(key):
+            group_id, day = key
+            lines.append(
+                f"group {group_id} on {day}: stored {actual.get(key)}, recomputed {expected.get(key)}"
+            )
+    return lines
+
+
+def rebuild():
+    """Replaces every summary row with the recomputed rows in the current transaction. Returns the number of rows."""
+    rows = recompute()
+    db.session.execute(db.delete(AttendanceSummary))
+    values = [
+        {
+            "group_id": group_id,
+            "day": day,
+            "enrolled": enrolled,
+            "present": present,
+            "absent": absent,
+            "late": late,
+        }
+        for (group_id, day), (enrolled, present, absent, late) in rows.items()
+    ]
+    if values:
+        db.session.execute(db.insert(AttendanceSummary), values)
+    return len(values)
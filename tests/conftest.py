@@ -0,0 +1,19 @@
+"""
+    Shared fixtures: the app built against a fresh SQLite database seeded by "flask cli db_init"
+"""
+
+import os
+import sys
+import pytest
+
+# The scripts' seeded_app() builds the app, and adds "src" to the import path when called
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts")
+)
+from seeded_app import seeded_app
+
+
+@pytest.fixture(scope="session")
+def seeded():
+    """Returns (app, client, headers) as seeded_app() does, built once for every test."""
+    return seeded_app()
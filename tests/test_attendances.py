@@ -0,0 +1,30 @@
+"""
+    Checks the queries run by the attendance endpoints
+"""
+
+# Shapes of the lazy loads that dumping a new attendance would run for each of its relationships
+LAZY_LOADS = ("WHERE children.id = ?", "WHERE groups.id = ?", "WHERE contacts.id = ?")
+
+
+def test_new_attendance_is_dumped_without_lazy_loads(seeded):
+    from instrumentation import count_queries
+
+    app, client, headers = seeded
+    with count_queries() as stats:
+        response = client.post(
+            "/children/2/attendances",
+            json={"group_id": 4, "contact_id": 2},
+            headers=headers("admin"),
+        )
+    assert response.status_code == 201
+    attendance = response.get_json()["Success"]
+    assert attendance["child"]["id"] == 2
+    assert attendance["group"] == {"group_name": "Emus", "day": "Friday"}
+    assert attendance["contact"]["id"] == 2
+    assert not [shape for shape in stats.shapes if shape.endswith(LAZY_LOADS)]
+    # The other tests share the seeded database
+    response = client.delete(
+        f"/children/2/attendances/{attendance['attendance_id']}",
+        headers=headers("admin"),
+    )
+    assert response.status_code == 200
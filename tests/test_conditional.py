@@ -0,0 +1,22 @@
+"""
+    Checks the headers of conditional GET responses
+"""
+
+import pytest
+
+
+@pytest.mark.parametrize("compression", [True, False])
+def test_not_modified_varies_like_the_full_response(seeded, monkeypatch, compression):
+    app, client, headers = seeded
+    monkeypatch.setitem(app.config, "COMPRESSION_ENABLED", compression)
+    response = client.get("/children/1", headers=headers("admin"))
+    assert response.status_code == 200
+    for validator in (
+        {"If-None-Match": response.headers["ETag"]},
+        {"If-Modified-Since": response.headers["Last-Modified"]},
+    ):
+        not_modified = client.get(
+            "/children/1", headers={**headers("admin"), **validator}
+        )
+        assert not_modified.status_code == 304
+        assert not_modified.headers["Vary"] == response.headers["Vary"]
@@ -0,0 +1,50 @@
+"""
+    Checks that every GET endpoint declaring a @query_budget stays within it for each role
+"""
+
+import pytest
+
+ROLES = ["admin", "teacher", "parent"]
+
+
+def budgeted_paths(app):
+    """Returns the path of every GET endpoint with a query budget, with its URL ids set to 1."""
+    paths = []
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions[rule.endpoint]
+        if "GET" in rule.methods and hasattr(view, "query_budget"):
+            paths.append(rule.build({name: 1 for name in rule.arguments})[1])
+    return sorted(paths)
+
+
+@pytest.mark.parametrize("role", ROLES)
+def test_get_endpoints_stay_within_budget(seeded, role):
+    from instrumentation import assert_query_budget
+
+    app, client, headers = seeded
+    paths = budgeted_paths(app)
+    assert paths
+    for path in paths:
+        for query in ("", "?limit=2"):
+            assert_query_budget(client, path + query, headers=headers(role))
+
+
+def test_path_without_trailing_slash_is_checked(seeded):
+    from instrumentation import assert_query_budget
+
+    app, client, headers = seeded
+    response = assert_query_budget(
+        client, "/children?limit=2", headers=headers("admin")
+    )
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+
+
+def test_budget_exceeded_raises(seeded, monkeypatch):
+    from instrumentation import assert_query_budget
+
+    app, client, headers = seeded
+    view = app.view_functions["child.get_children"]
+    monkeypatch.setattr(view, "query_budget", 0)
+    with pytest.raises(AssertionError, match="its budget is 0"):
+        assert_query_budget(client, "/children/", headers=headers("admin"))
@@ -0,0 +1,11 @@
+"""
+    Checks fast_dump() and OrjsonProvider against marshmallow and Flask's default JSON provider
+"""
+
+from check_serializers import find_differences
+
+
+def test_fast_dump_and_provider_match_defaults(seeded):
+    checked, failures = find_differences(*seeded)
+    assert checked > 0
+    assert failures == []